@@ -0,0 +1,213 @@
+# CS122 W'20: Markov models and hash tables
+# Fixed-memory approximate counts for Markov models
+
+import random
+from array import array
+import Hash_Table
+
+DEFAULT_DEPTH = 4
+CELL_BYTES = 8
+
+
+class Count_Min_Sketch:
+    '''
+    Approximate replacement for Compact_Hash_Table as the count store of a
+    Markov model. A key is hashed into one cell of each of "depth" rows of
+    "width" counters, and its count is estimated as the smallest of them.
+    Memory is fixed at width * depth counters however many distinct keys
+    are counted, and since keys are never stored, estimates can only be
+    too high, by the counts of keys sharing all of their cells. Increments
+    are conservative: only the cells below the new estimate are raised,
+    which keeps that error much smaller than plain addition.
+    '''
+
+    # Same hash function as Compact_Hash_Table, so that the rolling hashes
+    # computed by Markov can be passed in directly
+    gen_hash = Hash_Table.Compact_Hash_Table.gen_hash
+
+    def __init__(self, width, depth=DEFAULT_DEPTH, defval=0, seed=0):
+        '''
+        Construct an empty sketch
+
+        Input:  width(int): minimum number of counters per row (rounded up
+                            to a power of two)
+                depth(int): number of rows, i.e. of independent hashes
+                defval(int): count of a key that was never seen
+                seed(int): seed of the row hash functions; sketches can
+                           only be merged if they share it
+        '''
+
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.width = Hash_Table.power_of_two(width)
+        self.depth = depth
+        self.mask = self.width - 1
+        self.defval = defval
+        self.seed = seed
+        self.resizes = 0
+
+        rand = random.Random(seed)
+        self.multipliers = [rand.randrange(1, Hash_Table.HASH_MOD)
+                            for _ in range(depth)]
+        self.cells = array("q", [defval]) * (self.width * depth)
+
+    @classmethod
+    def with_budget(cls, memory_bytes, depth=DEFAULT_DEPTH, defval=0,
+                    seed=0):
+        '''
+        Construct the widest sketch whose counters fit in "memory_bytes"
+
+        Input:  memory_bytes(int): the memory budget of the counters
+                depth, defval, seed: as in the constructor
+
+        Output: (Count_Min_Sketch): an empty sketch
+        '''
+
+        width = Hash_Table.MIN_CAPACITY
+        while 2 * width * depth * CELL_BYTES <= memory_bytes:
+            width <<= 1
+
+        return cls(width, depth, defval, seed)
+
+    def empty_like(self):
+        '''
+        Output: (Count_Min_Sketch): an empty sketch of the same width,
+                depth and seed, which can be merged into this one
+        '''
+
+        return Count_Min_Sketch(self.width, self.depth, self.defval,
+                                self.seed)
+
+    def cell_indices(self, hash_val):
+        '''
+        Index in self.cells of the counter of a key in every row
+
+        Input: hash_val(int): the full hash of the key, from gen_hash
+
+        Output: (list): one index per row
+        '''
+
+        mod = Hash_Table.HASH_MOD
+        mask = self.mask
+        width = self.width
+
+        return [row * width + ((hash_val * multiplier) % mod & mask)
+                for row, multiplier in enumerate(self.multipliers)]
+
+    def lookup(self, key, hash_val=None):
+        '''
+        Estimate the count of a key
+
+        Input:  key(str): the key to look up
+                hash_val(int): optional full hash of key (see
+                               Compact_Hash_Table.lookup)
+
+        Output: (int): an upper bound on the count of key
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        cells = self.cells
+
+        return min(cells[idx] for idx in self.cell_indices(hash_val))
+
+    def update(self, key, val, hash_val=None):
+        '''
+        Make the estimate of a key at least "val". Counters are never
+        lowered, since they are shared with other keys.
+
+        Input:  key(str): the key to update
+                val(int): its new count
+                hash_val(int): optional full hash of key
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        cells = self.cells
+        for idx in self.cell_indices(hash_val):
+            if cells[idx] < val:
+                cells[idx] = val
+
+    def increment(self, key, delta=1, hash_val=None):
+        '''
+        Add "delta" to the count of a key, with a conservative update
+
+        Input:  key(str): the key whose count is incremented
+                delta(int): the amount to add
+                hash_val(int): optional full hash of key
+
+        Output: val(int): the new estimate of the count of key
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        cells = self.cells
+        indices = self.cell_indices(hash_val)
+
+        val = min(cells[idx] for idx in indices) + delta
+        for idx in indices:
+            if cells[idx] < val:
+                cells[idx] = val
+
+        return val
+
+    def update_many(self, pairs):
+        '''
+        Update the sketch with every (key, val) pair of an iterable
+
+        Input: pairs(iterable): (key, val) tuples, as passed to update
+        '''
+
+        for key, val in pairs:
+            self.update(key, val)
+
+    def count_all(self, keys):
+        '''
+        Increment the count of every key of an iterable by one
+
+        Input: keys(iterable): the keys to count
+        '''
+
+        for key in keys:
+            self.increment(key)
+
+    def merge(self, other):
+        '''
+        Add the counts of another store into this one. Sketches of the
+        same shape and seed are added counter by counter; any other store
+        (e.g. a Compact_Hash_Table counted by a worker process) is added
+        key by key.
+
+        Input: other(Count_Min_Sketch or Compact_Hash_Table): the counts to
+                                                             merge in
+        '''
+
+        if isinstance(other, Count_Min_Sketch):
+            if (other.width, other.depth, other.seed) != (
+                    self.width, self.depth, self.seed):
+                raise ValueError("only sketches of the same width, depth "
+                                 "and seed can be merged")
+            cells = self.cells
+            for idx, val in enumerate(other.cells):
+                cells[idx] += val - other.defval
+            return
+
+        for key, val in other.items():
+            self.increment(key, val)
+
+    def shrink(self):
+        '''
+        A sketch has a fixed size; kept for compatibility with
+        Compact_Hash_Table
+        '''
+
+    def memory_bytes(self):
+        '''
+        Output: (int): the memory taken by the counters
+        '''
+
+        return len(self.cells) * self.cells.itemsize
+
+    def __repr__(self):
+        return "Count_Min_Sketch(width={}, depth={})".format(self.width,
+                                                             self.depth)
@@ -2,13 +2,74 @@
 # Allen (Yixin) Hu
 
 
+import time
+from array import array
+
+
 TOO_FULL = 0.5
 GROWTH_RATIO = 2
 
+# Compact_Hash_Table keeps the full (unreduced) hash of every key, taken
+# modulo a Mersenne prime so that it fits in a signed 64-bit array slot
+HASH_BASE = 131
+HASH_MOD = (1 << 61) - 1
+# Integer keys are hashed multiplicatively so that their low bits mix well,
+# and every full hash is mixed the same way to pick its cell (see home)
+INT_HASH_MULT = 0x9E3779B97F4A7C15
+MIN_CAPACITY = 8
+
+
+def home(hash_val, mask):
+    '''
+    Cell where the probe run of a key starts. The polynomial hashes of
+    short keys are small and close together, and would crowd into a few
+    long runs under linear probing if reduced directly, so the full hash
+    is first mixed multiplicatively, as integer keys are by gen_hash.
+
+    Input:  hash_val(int): the full hash of the key, from gen_hash
+            mask(int): the number of cells of the table minus one
+
+    Output: (int): the index of the home cell
+    '''
+
+    return (hash_val * INT_HASH_MULT) % HASH_MOD & mask
+
+
+def check_policy(max_load, growth_ratio):
+    '''
+    Validate the growth policy of a hash table: the table must always keep
+    an empty cell for linear probing to terminate, and must actually grow
+
+    Input:  max_load(float): maximum fraction of occupied cells
+            growth_ratio(float): factor by which the table grows
+    '''
+
+    if not 0 < max_load < 1:
+        raise ValueError("max_load must be between 0 and 1")
+    if growth_ratio <= 1:
+        raise ValueError("growth_ratio must be greater than 1")
+
+
+def power_of_two(cells):
+    '''
+    Round a number of cells up to a power of two, and to at least
+    MIN_CAPACITY
+
+    Input: cells(float): the requested number of cells
+
+    Output: capacity(int): the smallest power of two >= cells
+    '''
+
+    capacity = MIN_CAPACITY
+    while capacity < cells:
+        capacity <<= 1
+
+    return capacity
+
 
 class Hash_Table:
 
-    def __init__(self,cells,defval):
+    def __init__(self,cells,defval,max_load=TOO_FULL,growth_ratio=GROWTH_RATIO):
         '''
         Construct a new hash table with a fixed number of cells equal to the
         parameter "cells", and which yields the value defval upon a lookup to a
@@ -18,11 +79,17 @@ class Hash_Table:
                 defval(int): a default value which
                              the user will choose to use as to
                              not raise key errors in the hash table
+                max_load(float): fraction of occupied cells above which
+                                 the table grows
+                growth_ratio(int): factor by which the table grows
         '''
 
+        check_policy(max_load, growth_ratio)
         self.hash_table = [defval] * cells
         self.defval = defval
         self.cnt = 0
+        self.max_load = max_load
+        self.growth_ratio = growth_ratio
 
     def gen_hash(self, input_key):
         '''
@@ -59,14 +126,17 @@ class Hash_Table:
             if final_hash > len(self.hash_table) - 1:
                 final_hash = 0
             if final_hash == begin:
+                # Only reachable if the table was built completely full;
+                # the indices of the old table are meaningless after this
                 self.rehashing()
+                return self.linear_probing(input_key)
 
         return final_hash
 
     def rehashing(self):
         '''
-        If the table exceeds the TOO_FULL value, constructs a larger hash
-        table by the GROWTH_RATIO term, and migrate previous data into
+        If the table exceeds its maximum load, constructs a larger hash
+        table by the growth ratio, and migrate previous data into
         the new hash table
 
         Input: N/A [Inplace Modification of Hash Table]
@@ -74,13 +144,16 @@ class Hash_Table:
 
         '''
 
-        migrated_table = [self.defval] * (len(self.hash_table) * GROWTH_RATIO)
+        new_cells = max(len(self.hash_table) + 1,
+                        int(len(self.hash_table) * self.growth_ratio))
+        migrated_table = [self.defval] * new_cells
         curr_items = []
         for item in self.hash_table:
             if item != self.defval:
                 curr_items.append(item)
 
         self.hash_table = migrated_table
+        self.cnt = 0
 
         for key, val in curr_items:
             self.update(key, val)
@@ -120,15 +193,757 @@ class Hash_Table:
                         second entry of the tuple.
         '''
         begin_idx = self.linear_probing(key)
+        is_new = self.hash_table[begin_idx] == self.defval
 
-        if self.hash_table[begin_idx] == self.defval:
+        self.hash_table[begin_idx] = (key, val)
+
+        if is_new:
             self.cnt += 1
-            curr_ratio = (1 - self.cnt) / len(self.hash_table)
-            if curr_ratio > TOO_FULL:
-                self.cnt = 0
+            curr_ratio = self.cnt / len(self.hash_table)
+            if curr_ratio > self.max_load:
                 self.rehashing()
-                
-        self.hash_table[begin_idx] = (key, val)
 
     def __repr__(self):
         return str(self.hash_table)
+
+
+class Compact_Hash_Table:
+    '''
+    Open-addressing hash table with the same lookup/update interface as
+    Hash_Table, but laid out as three parallel arrays (keys, values and
+    full hash values) instead of a list of (key, val) tuples. The capacity
+    is always a power of two so that a bit mask replaces the modulo, and
+    since the full hash of every key is kept, growing the table never
+    needs to hash a key again.
+    '''
+
+    __slots__ = ("keys", "vals", "hashes", "mask", "cnt", "defval",
+                 "max_load", "growth_ratio", "resizes",
+                 "shrinks")
+
+    def __init__(self, cells, defval, max_load=TOO_FULL,
+                 growth_ratio=GROWTH_RATIO):
+        '''
+        Construct a new compact hash table with at least "cells" cells
+        (rounded up to a power of two), which yields the value defval upon
+        a lookup to a key that has not previously been inserted
+
+        Input:  cells(int): minimum number of cells the table starts with
+                defval(*): value returned for keys that are not present
+                max_load(float): fraction of occupied cells above which
+                                 the table grows
+                growth_ratio(float): factor by which the table grows (the
+                                     new capacity is rounded up to a power
+                                     of two)
+        '''
+
+        check_policy(max_load, growth_ratio)
+        self.max_load = max_load
+        self.growth_ratio = growth_ratio
+        self.defval = defval
+        self.cnt = 0
+        self.resizes = 0
+        self.shrinks = 0
+        self.allocate(power_of_two(cells))
+
+    @classmethod
+    def with_capacity(cls, expected_keys, defval, max_load=TOO_FULL,
+                      growth_ratio=GROWTH_RATIO):
+        '''
+        Construct a table large enough to hold "expected_keys" keys without
+        growing
+
+        Input:  expected_keys(int): number of keys the caller expects
+                defval, max_load, growth_ratio: as in the constructor
+
+        Output: (Compact_Hash_Table): an empty pre-sized table
+        '''
+
+        return cls(int(expected_keys / max_load) + 1, defval, max_load,
+                   growth_ratio)
+
+    def allocate(self, capacity):
+        '''
+        Replace the arrays of the table with empty ones of "capacity" cells
+
+        Input: capacity(int): the new number of cells, a power of two
+        '''
+
+        self.keys = [None] * capacity
+        self.vals = [self.defval] * capacity
+        self.hashes = array("q", [0]) * capacity
+        self.mask = capacity - 1
+
+    def gen_hash(self, input_key):
+        '''
+        Computes the full hash value of a key. Unlike Hash_Table.gen_hash,
+        the value is not reduced by the size of the table. It is a plain
+        polynomial hash, so callers can also maintain it as a rolling hash
+        over a sliding window and pass it to lookup/update directly.
+
+        Input: input_key(str or int): the key which user wishes to hash
+
+        Output: hash_val(int): a hash value in [0, HASH_MOD)
+        '''
+        if isinstance(input_key, int):
+            return (input_key * INT_HASH_MULT) % HASH_MOD
+
+        hash_val = 0
+        for letter in input_key:
+            hash_val = (hash_val * HASH_BASE + ord(letter)) % HASH_MOD
+
+        return hash_val
+
+    def find_slot(self, key, hash_val):
+        '''
+        Linear probe the table for "key", starting from the cell selected by
+        its hash value. The table is never full, so the probe always ends
+        either on the cell holding "key" or on an empty cell.
+
+        Input:  key(str): the key to look for
+                hash_val(int): the full hash value of key
+
+        Output: idx(int): index of the cell holding key, or of the empty
+                          cell where key would be inserted
+        '''
+        keys = self.keys
+        hashes = self.hashes
+        mask = self.mask
+        idx = home(hash_val, mask)
+
+        while True:
+            slot_key = keys[idx]
+            if slot_key is None:
+                return idx
+            if hashes[idx] == hash_val and slot_key == key:
+                return idx
+            idx = (idx + 1) & mask
+
+    def rehashing(self):
+        '''
+        Grow the table by its growth ratio and migrate every entry into the
+        new arrays
+
+        Input: N/A [Inplace Modification of Hash Table]
+        Output: N/A [Inplace Modification of Hash Table]
+        '''
+
+        self.resize(power_of_two(len(self.keys) * self.growth_ratio))
+
+    def shrink(self):
+        '''
+        Shrink the table to the smallest capacity that keeps it under its
+        maximum load, e.g. after it was pre-sized with a generous estimate
+
+        Input: N/A [Inplace Modification of Hash Table]
+        Output: N/A [Inplace Modification of Hash Table]
+        '''
+
+        capacity = power_of_two(int(self.cnt / self.max_load) + 1)
+        if capacity < len(self.keys):
+            self.resize(capacity)
+            self.shrinks += 1
+
+    def resize(self, capacity):
+        '''
+        Migrate every entry into new arrays of "capacity" cells, reusing the
+        stored hash values instead of hashing the keys again
+
+        Input: capacity(int): the new number of cells, a power of two
+        '''
+
+        old_keys = self.keys
+        old_vals = self.vals
+        old_hashes = self.hashes
+        self.allocate(capacity)
+        self.resizes += 1
+
+        keys = self.keys
+        vals = self.vals
+        hashes = self.hashes
+        mask = self.mask
+
+        for old_idx, key in enumerate(old_keys):
+            if key is None:
+                continue
+            hash_val = old_hashes[old_idx]
+            idx = home(hash_val, mask)
+            while keys[idx] is not None:
+                idx = (idx + 1) & mask
+            keys[idx] = key
+            vals[idx] = old_vals[old_idx]
+            hashes[idx] = hash_val
+
+    def lookup(self, key, hash_val=None):
+        '''
+        Retrieve the value associated with the specified key in the hash table,
+        or return the default value if it has not previously been inserted.
+
+        Input: key(str): the key to look up
+               hash_val(int): optional full hash of key, as returned by
+                              gen_hash, for callers that compute it
+                              incrementally (e.g. a rolling hash)
+
+        Output: the value stored for key, or self.defval if key is absent
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        idx = self.find_slot(key, hash_val)
+        if self.keys[idx] is None:
+            return self.defval
+        return self.vals[idx]
+
+    def update(self, key, val, hash_val=None):
+        '''
+        Change the value associated with key "key" to value "val".
+        If "key" is not currently present in the hash table, insert it.
+
+        Input:  key(str): the key to insert or modify
+                val(*): the value to store for key
+                hash_val(int): optional full hash of key (see lookup)
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        idx = self.find_slot(key, hash_val)
+
+        if self.keys[idx] is None:
+            self.keys[idx] = key
+            self.hashes[idx] = hash_val
+            self.vals[idx] = val
+            self.cnt += 1
+            if self.cnt > self.max_load * len(self.keys):
+                self.rehashing()
+        else:
+            self.vals[idx] = val
+
+    def increment(self, key, delta=1, hash_val=None):
+        '''
+        Add "delta" to the value associated with key "key", treating a key
+        that is not present as holding the default value. Unlike a lookup
+        followed by an update, the probe sequence is walked only once.
+
+        Input:  key(str): the key whose value is incremented
+                delta(int): the amount to add
+                hash_val(int): optional full hash of key (see lookup)
+
+        Output: val(int): the new value associated with key
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        idx = self.find_slot(key, hash_val)
+
+        if self.keys[idx] is None:
+            val = self.defval + delta
+            self.keys[idx] = key
+            self.hashes[idx] = hash_val
+            self.vals[idx] = val
+            self.cnt += 1
+            if self.cnt > self.max_load * len(self.keys):
+                self.rehashing()
+        else:
+            val = self.vals[idx] + delta
+            self.vals[idx] = val
+
+        return val
+
+    def decrement(self, key, delta=1, hash_val=None):
+        '''
+        Subtract "delta" from the value associated with key "key". A key
+        whose value falls back to the default value is deleted, so that a
+        decrement exactly undoes an increment; the keys after it in its
+        probe run are shifted back to fill the hole (backward-shift
+        deletion), so lookups never need tombstones.
+
+        Input:  key(str): the key whose value is decremented
+                delta(int): the amount to subtract
+                hash_val(int): optional full hash of key (see lookup)
+
+        Output: val(int): the new value associated with key
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        idx = self.find_slot(key, hash_val)
+
+        if self.keys[idx] is None:
+            raise KeyError(key)
+        val = self.vals[idx] - delta
+        if val == self.defval:
+            self.delete_slot(idx)
+        else:
+            self.vals[idx] = val
+
+        return val
+
+    def delete_slot(self, idx):
+        '''
+        Remove the entry of cell "idx", moving back every following entry
+        of the same probe run that may take its place
+
+        Input: idx(int): index of an occupied cell
+        '''
+        keys = self.keys
+        vals = self.vals
+        hashes = self.hashes
+        mask = self.mask
+
+        nxt = idx
+        while True:
+            nxt = (nxt + 1) & mask
+            if keys[nxt] is None:
+                break
+            # The entry at nxt may move into the hole only if the hole is
+            # not before its home cell, i.e. it stays on its probe path
+            if (nxt - home(hashes[nxt], mask)) & mask >= (nxt - idx) & mask:
+                keys[idx] = keys[nxt]
+                vals[idx] = vals[nxt]
+                hashes[idx] = hashes[nxt]
+                idx = nxt
+
+        keys[idx] = None
+        vals[idx] = self.defval
+        hashes[idx] = 0
+        self.cnt -= 1
+
+    def update_many(self, pairs):
+        '''
+        Update the table with every (key, val) pair of an iterable
+
+        Input: pairs(iterable): (key, val) tuples, as passed to update
+        '''
+
+        for key, val in pairs:
+            self.update(key, val)
+
+    def count_all(self, keys):
+        '''
+        Increment the value of every key of an iterable by one, so that the
+        table ends up holding the number of occurrences of each key
+
+        Input: keys(iterable): the keys to count
+        '''
+
+        for key in keys:
+            self.increment(key)
+
+    def merge(self, other):
+        '''
+        Add the values of another table into this one, key by key, as
+        increment would. Both tables use the same hash function, so the
+        stored hashes of "other" are reused and no key is hashed again.
+
+        Input: other(Compact_Hash_Table): the table to merge in, left
+                                          unchanged
+        '''
+
+        other_vals = other.vals
+        other_hashes = other.hashes
+        for idx, key in enumerate(other.keys):
+            if key is not None:
+                self.increment(key, other_vals[idx], other_hashes[idx])
+
+    def subtract(self, other):
+        '''
+        Undo a merge: subtract the values of another table from this one,
+        key by key, as decrement would
+
+        Input: other(Compact_Hash_Table): the table to subtract, whose keys
+                                          must all be present in this one
+        '''
+
+        other_vals = other.vals
+        other_hashes = other.hashes
+        for idx, key in enumerate(other.keys):
+            if key is not None:
+                self.decrement(key, other_vals[idx], other_hashes[idx])
+
+    def load_factor(self):
+        '''
+        Output: (float): the fraction of cells currently occupied
+        '''
+
+        return self.cnt / len(self.keys)
+
+    def average_probe_length(self):
+        '''
+        Average number of cells a successful lookup visits, computed from
+        how far each key sits from the cell its hash selects
+
+        Output: (float): the mean probe length over all stored keys
+        '''
+
+        if self.cnt == 0:
+            return 0.0
+
+        mask = self.mask
+        hashes = self.hashes
+        total = 0
+        for idx, key in enumerate(self.keys):
+            if key is not None:
+                total += ((idx - home(hashes[idx], mask)) & mask) + 1
+
+        return total / self.cnt
+
+    def items(self):
+        '''
+        Iterate over the (key, val) pairs stored in the table
+
+        Output: generator of (key, val) tuples, in no particular order
+        '''
+
+        vals = self.vals
+        for idx, key in enumerate(self.keys):
+            if key is not None:
+                yield key, vals[idx]
+
+    def __len__(self):
+        return self.cnt
+
+    def __repr__(self):
+        return str([(key, self.vals[idx])
+                    for idx, key in enumerate(self.keys) if key is not None])
+
+
+class Instrumented_Hash_Table(Compact_Hash_Table):
+    '''
+    Compact_Hash_Table that also records how it is used: the number of
+    lookups and of inserted keys, a histogram of probe lengths (cells
+    visited per lookup, update or increment), the time spent resizing, and
+    through stats() the resize count and load factor. Instrumentation is
+    enabled by using this class in place of Compact_Hash_Table, which
+    itself records nothing and so pays nothing for it.
+    '''
+
+    __slots__ = ("lookups", "inserts", "probe_histogram", "rehash_seconds")
+
+    def __init__(self, cells, defval, max_load=TOO_FULL,
+                 growth_ratio=GROWTH_RATIO):
+        self.lookups = 0
+        self.inserts = 0
+        self.probe_histogram = {}
+        self.rehash_seconds = 0.0
+        super().__init__(cells, defval, max_load, growth_ratio)
+
+    def find_slot(self, key, hash_val):
+        keys = self.keys
+        hashes = self.hashes
+        mask = self.mask
+        idx = home(hash_val, mask)
+        probes = 1
+
+        while True:
+            slot_key = keys[idx]
+            if slot_key is None or (hashes[idx] == hash_val and
+                                    slot_key == key):
+                break
+            idx = (idx + 1) & mask
+            probes += 1
+
+        histogram = self.probe_histogram
+        histogram[probes] = histogram.get(probes, 0) + 1
+
+        return idx
+
+    def lookup(self, key, hash_val=None):
+        self.lookups += 1
+        return super().lookup(key, hash_val)
+
+    def update(self, key, val, hash_val=None):
+        cnt = self.cnt
+        super().update(key, val, hash_val)
+        self.inserts += self.cnt - cnt
+
+    def increment(self, key, delta=1, hash_val=None):
+        cnt = self.cnt
+        val = super().increment(key, delta, hash_val)
+        self.inserts += self.cnt - cnt
+        return val
+
+    def rehashing(self):
+        # Only growth is timed; the final shrink is reported separately
+        start = time.perf_counter()
+        super().rehashing()
+        self.rehash_seconds += time.perf_counter() - start
+
+    def stats(self):
+        '''
+        Usage figures recorded so far
+
+        Output: (dict): lookups, inserts, grows, shrinks, load_factor,
+                entries, capacity, rehash_seconds (spent growing),
+                avg_probe_length (over every probe made) and
+                probe_histogram (probe length -> count)
+        '''
+
+        probes = sum(self.probe_histogram.values())
+        return {"lookups": self.lookups,
+                "inserts": self.inserts,
+                "grows": self.resizes - self.shrinks,
+                "shrinks": self.shrinks,
+                "load_factor": self.load_factor(),
+                "entries": self.cnt,
+                "capacity": len(self.keys),
+                "rehash_seconds": self.rehash_seconds,
+                "avg_probe_length": (sum(length * count for length, count
+                                         in self.probe_histogram.items()) /
+                                     probes if probes else 0.0),
+                "probe_histogram": dict(sorted(
+                    self.probe_histogram.items()))}
+
+
+class Span_Hash_Table:
+    '''
+    Counting hash table whose keys are substrings of one immutable text,
+    stored as (offset, length) spans instead of string objects. Offsets,
+    lengths, counts and full hashes are kept in four parallel arrays, so a
+    key costs a few machine words rather than a string of its own, and
+    spans are compared directly on a UTF-32 view of the text. Lookups by
+    string key (e.g. when scoring) are compared against the text in place.
+    Hash values are those of Compact_Hash_Table.gen_hash.
+    '''
+
+    __slots__ = ("text", "codes", "offsets", "lengths", "vals", "hashes",
+                 "mask", "cnt", "defval", "max_load", "growth_ratio",
+                 "resizes", "shrinks")
+
+    def __init__(self, text, cells, defval=0, max_load=TOO_FULL,
+                 growth_ratio=GROWTH_RATIO):
+        '''
+        Construct an empty table of spans of "text"
+
+        Input:  text(str): the text every key is a substring of
+                cells(int): minimum number of cells the table starts with
+                defval(int): count of a key that is not present
+                max_load, growth_ratio: as in Compact_Hash_Table
+        '''
+
+        check_policy(max_load, growth_ratio)
+        self.text = text
+        self.codes = memoryview(text.encode("utf-32-le")).cast("I")
+        self.max_load = max_load
+        self.growth_ratio = growth_ratio
+        self.defval = defval
+        self.cnt = 0
+        self.resizes = 0
+        self.shrinks = 0
+        self.allocate(power_of_two(cells))
+
+    def allocate(self, capacity):
+        '''
+        Replace the arrays of the table with empty ones of "capacity" cells
+
+        Input: capacity(int): the new number of cells, a power of two
+        '''
+
+        self.offsets = array("q", [-1]) * capacity
+        self.lengths = array("i", [0]) * capacity
+        self.vals = array("q", [self.defval]) * capacity
+        self.hashes = array("q", [0]) * capacity
+        self.mask = capacity - 1
+
+    gen_hash = Compact_Hash_Table.gen_hash
+
+    def find_span(self, offset, length, hash_val):
+        '''
+        Linear probe the table for the span text[offset:offset + length]
+
+        Input:  offset(int), length(int): the span to look for
+                hash_val(int): the full hash value of the span
+
+        Output: idx(int): index of the cell holding an equal span, or of
+                          the empty cell where it would be inserted
+        '''
+        offsets = self.offsets
+        lengths = self.lengths
+        hashes = self.hashes
+        codes = self.codes
+        mask = self.mask
+        idx = home(hash_val, mask)
+
+        while True:
+            slot_offset = offsets[idx]
+            if slot_offset < 0:
+                return idx
+            if (hashes[idx] == hash_val and lengths[idx] == length and
+                    (slot_offset == offset or
+                     codes[slot_offset:slot_offset + length] ==
+                     codes[offset:offset + length])):
+                return idx
+            idx = (idx + 1) & mask
+
+    def find_slot(self, key, hash_val):
+        '''
+        Linear probe the table for a string key
+
+        Input:  key(str): the key to look for
+                hash_val(int): the full hash value of key
+
+        Output: idx(int): index of the cell holding key, or of an empty cell
+        '''
+        offsets = self.offsets
+        lengths = self.lengths
+        hashes = self.hashes
+        text = self.text
+        mask = self.mask
+        length = len(key)
+        idx = home(hash_val, mask)
+
+        while True:
+            slot_offset = offsets[idx]
+            if slot_offset < 0:
+                return idx
+            if (hashes[idx] == hash_val and lengths[idx] == length and
+                    text.startswith(key, slot_offset)):
+                return idx
+            idx = (idx + 1) & mask
+
+    def increment_span(self, offset, length, delta=1, hash_val=None):
+        '''
+        Add "delta" to the count of the span text[offset:offset + length]
+
+        Input:  offset(int), length(int): the span
+                delta(int): the amount to add
+                hash_val(int): optional full hash of the span
+
+        Output: val(int): the new count of the span
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(self.text[offset:offset + length])
+        idx = self.find_span(offset, length, hash_val)
+
+        if self.offsets[idx] < 0:
+            val = self.defval + delta
+            self.offsets[idx] = offset
+            self.lengths[idx] = length
+            self.hashes[idx] = hash_val
+            self.vals[idx] = val
+            self.cnt += 1
+            if self.cnt > self.max_load * len(self.offsets):
+                self.rehashing()
+        else:
+            val = self.vals[idx] + delta
+            self.vals[idx] = val
+
+        return val
+
+    def lookup(self, key, hash_val=None):
+        '''
+        Retrieve the count of a string key, or the default value if no span
+        of the text equal to it was inserted
+
+        Input:  key(str): the key to look up
+                hash_val(int): optional full hash of key
+
+        Output: the count of key
+        '''
+
+        if hash_val is None:
+            hash_val = self.gen_hash(key)
+        idx = self.find_slot(key, hash_val)
+        if self.offsets[idx] < 0:
+            return self.defval
+        return self.vals[idx]
+
+    def rehashing(self):
+        '''
+        Grow the table by its growth ratio
+
+        Input: N/A [Inplace Modification of Hash Table]
+        Output: N/A [Inplace Modification of Hash Table]
+        '''
+
+        self.resize(power_of_two(len(self.offsets) * self.growth_ratio))
+
+    def shrink(self):
+        '''
+        Shrink the table to the smallest capacity that keeps it under its
+        maximum load
+
+        Input: N/A [Inplace Modification of Hash Table]
+        Output: N/A [Inplace Modification of Hash Table]
+        '''
+
+        capacity = power_of_two(int(self.cnt / self.max_load) + 1)
+        if capacity < len(self.offsets):
+            self.resize(capacity)
+            self.shrinks += 1
+
+    def resize(self, capacity):
+        '''
+        Migrate every entry into new arrays of "capacity" cells, reusing the
+        stored hash values
+
+        Input: capacity(int): the new number of cells, a power of two
+        '''
+
+        old_offsets = self.offsets
+        old_lengths = self.lengths
+        old_vals = self.vals
+        old_hashes = self.hashes
+        self.allocate(capacity)
+        self.resizes += 1
+
+        offsets = self.offsets
+        mask = self.mask
+
+        for old_idx, offset in enumerate(old_offsets):
+            if offset < 0:
+                continue
+            hash_val = old_hashes[old_idx]
+            idx = home(hash_val, mask)
+            while offsets[idx] >= 0:
+                idx = (idx + 1) & mask
+            offsets[idx] = offset
+            self.lengths[idx] = old_lengths[old_idx]
+            self.vals[idx] = old_vals[old_idx]
+            self.hashes[idx] = hash_val
+
+    def load_factor(self):
+        '''
+        Output: (float): the fraction of cells currently occupied
+        '''
+
+        return self.cnt / len(self.offsets)
+
+    def average_probe_length(self):
+        '''
+        Output: (float): the mean probe length over all stored keys (see
+                         Compact_Hash_Table.average_probe_length)
+        '''
+
+        if self.cnt == 0:
+            return 0.0
+
+        mask = self.mask
+        hashes = self.hashes
+        total = 0
+        for idx, offset in enumerate(self.offsets):
+            if offset >= 0:
+                total += ((idx - home(hashes[idx], mask)) & mask) + 1
+
+        return total / self.cnt
+
+    def items(self):
+        '''
+        Iterate over the (key, count) pairs stored in the table; the key
+        strings are only sliced out of the text here
+
+        Output: generator of (key, val) tuples, in no particular order
+        '''
+
+        text = self.text
+        lengths = self.lengths
+        vals = self.vals
+        for idx, offset in enumerate(self.offsets):
+            if offset >= 0:
+                yield text[offset:offset + lengths[idx]], vals[idx]
+
+    def __len__(self):
+        return self.cnt
+
+    def __repr__(self):
+        return str(list(self.items()))
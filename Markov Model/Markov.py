@@ -1,26 +1,85 @@
 # CS122 W'20: Markov models and hash tables
 # Allen (Yixin) Hu
 
-import sys
+import os
+import argparse
 import math
+import concurrent.futures
+from array import array
 import Hash_Table
+import Model_File
 
 HASH_CELLS = 57
+CHUNK_SIZE = 1 << 20
+ESTIMATE_SAMPLE = 1 << 13
+BACKENDS = ["hash", "numpy", "word"]
+SPEECH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "speeches")
+
+# Model of the worker processes of log_probability_parallel, set once by
+# init_scorer
+scoring_model = None
 
 class Markov:
 
-    def __init__(self,k,s):
+    def __init__(self,k,s,store=None):
         '''
         Construct a new k-order Markov model using the statistics of string "s"
 
         Input:  k(int): integer denoting the kth-order of the Markov model
                 s(str): string containing speech of a known candidate,
                         used for 'training' our model for comparions later
+                store: empty table to count the tokens in, with the
+                       interface of Compact_Hash_Table, e.g. a
+                       Count_Min_Sketch to bound memory (default: an exact
+                       Compact_Hash_Table)
         '''
 
-        self.mkv_hash = Hash_Table.Hash_Table(HASH_CELLS, 0)
+        # The default table starts small, and is only sized for the training
+        # text once it is counted (see presize_store)
+        self.presize = store is None
+        if store is None:
+            store = Hash_Table.Compact_Hash_Table(HASH_CELLS, 0)
+        self.mkv_hash = store
         self.training_str = s
         self.order = k
+        self.chars = set(s)
+
+        # State of streaming training (see update): the first and last k
+        # characters seen so far, and the number of characters seen
+        self.head = ""
+        self.tail = ""
+        self.length = 0
+        self.finished = False
+
+        # Table of log probabilities built by compile
+        self.compiled = None
+        self.unseen_log_prob = None
+
+    @classmethod
+    def from_files(cls, k, paths, chunk_size=CHUNK_SIZE):
+        '''
+        Train a k-order Markov model on the concatenation of several text
+        files, streaming them in chunks of chunk_size characters so that
+        the files never need to fit in memory
+
+        Input:  k(int): integer denoting the kth-order of the Markov model
+                paths(list): the files to train on, in order
+                chunk_size(int): number of characters read at a time
+
+        Output: (Markov): the trained model
+        '''
+
+        model = cls(k, "")
+        for path in paths:
+            with open(path) as f:
+                chunk = f.read(chunk_size)
+                while chunk:
+                    model.update(chunk)
+                    chunk = f.read(chunk_size)
+        model.finish()
+
+        return model
 
     def get_counts(self):
         '''
@@ -31,27 +90,148 @@ class Markov:
         Output: N/A [Inplace Modification of Hash Table]
         '''
 
-        length_str = len(self.training_str)
+        self.presize_store()
+        self.update(self.training_str)
+        self.finish()
 
-        for i in range(length_str):
-            front_cut = i - self.order
-            if front_cut < 0:
-                first_half = self.training_str[length_str + front_cut:]
-                last_half_full = self.training_str[:i + 1]
-                last_half_partial = self.training_str[:i]
+    def presize_store(self):
+        '''
+        Replace the small default table of the constructor with one sized
+        for the distinct tokens of the training text (see estimate_keys),
+        so that counting the text rarely needs to grow it. A store passed
+        to the constructor, or one already holding counts, is kept.
+        '''
 
-                final_key_full = first_half + last_half_full
-                final_key_partial = first_half + last_half_partial
+        if self.presize and len(self.mkv_hash) == 0:
+            self.mkv_hash = Hash_Table.Compact_Hash_Table.with_capacity(
+                estimate_keys(self.training_str,
+                              [self.order, self.order + 1]), 0)
+        self.presize = False
 
-            else:
-                final_key_full = self.training_str[front_cut:i+1]
-                final_key_partial = self.training_str[front_cut:i]
+    def get_counts_parallel(self, processes=None, shards=None):
+        '''
+        Same as get_counts, but counts the training string in several
+        processes: the wrapped string is split into shards that overlap by
+        k characters, each shard is counted into its own table, and the
+        tables are merged. The counts are identical to those of get_counts.
+
+        Input:  processes(int): number of worker processes (default: one
+                                per core)
+                shards(int): number of shards (default: one per process)
+        '''
+
+        if self.finished:
+            raise ValueError("the model was already finished")
+        if len(self.training_str) < self.order:
+            self.get_counts()
+            return
+
+        k = self.order
+        wrapped_str = wrap_around(self.training_str, k)
+        positions = len(self.training_str)
+        if shards is None:
+            shards = processes or os.cpu_count() or 1
+        bounds = [k + positions * j // shards for j in range(shards + 1)]
+        shard_strs = [wrapped_str[bounds[j] - k:bounds[j + 1]]
+                      for j in range(shards) if bounds[j] < bounds[j + 1]]
+
+        # A store of fixed size (Count_Min_Sketch) has every shard counted
+        # into an empty store of the same shape, rather than into an exact
+        # table that would grow without bound
+        self.presize_store()
+        empty_like = getattr(self.mkv_hash, "empty_like", None)
+        shard_store = empty_like() if empty_like is not None else None
+
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            for table in executor.map(count_shard, shard_strs,
+                                      [k] * len(shard_strs),
+                                      [shard_store] * len(shard_strs)):
+                self.mkv_hash.merge(table)
+
+        self.length = positions
+        self.finished = True
+        self.mkv_hash.shrink()
+
+    def get_counts_spans(self):
+        '''
+        Same as get_counts, but keys the counts on spans of the wrapped
+        training string (see Hash_Table.Span_Hash_Table) instead of sliced
+        strings, so that training allocates no string per position and the
+        trained table holds no key strings. The counts are identical to
+        those of get_counts, and the model scores texts the same way.
+        '''
+
+        if self.finished:
+            raise ValueError("the model was already finished")
+        if len(self.training_str) < self.order:
+            self.get_counts()
+            return
+
+        wrapped_str = wrap_around(self.training_str, self.order)
+        expected_keys = estimate_keys(self.training_str,
+                                      [self.order, self.order + 1])
+        self.mkv_hash = Hash_Table.Span_Hash_Table(
+            wrapped_str, int(expected_keys / Hash_Table.TOO_FULL) + 1, 0)
+        count_spans(self.mkv_hash, self.order)
+
+        self.length = len(self.training_str)
+        self.finished = True
+        self.mkv_hash.shrink()
+
+    def update(self, text_chunk):
+        '''
+        Continue training on the next chunk of the text. Only the k
+        characters preceding the chunk are kept between calls, so that the
+        tokens spanning two chunks are counted; the tokens at the start of
+        the text, which wrap around to its end, are counted by finish.
+
+        Input: text_chunk(str): the next part of the training text
+        '''
+
+        if self.finished:
+            raise ValueError("the model was already finished")
+
+        k = self.order
+        if len(self.head) < k:
+            self.head += text_chunk[:k - len(self.head)]
+        self.chars.update(text_chunk)
+        self.length += len(text_chunk)
+
+        # Positions k and above of the buffer have their full k characters
+        # of context, which are exactly the positions of the chunk once the
+        # first k characters of the text have been seen
+        buffer_str = self.tail + text_chunk
+        self.count_grams(buffer_str)
+        self.tail = buffer_str[max(len(buffer_str) - k, 0):]
 
-            val_full = self.mkv_hash.lookup(final_key_full)
-            self.mkv_hash.update(final_key_full, val_full + 1)
+    def finish(self):
+        '''
+        Complete streaming training by counting the tokens of the first k
+        positions, whose context wraps around to the end of the text. The
+        counts are then the same as if the whole text had been counted at
+        once, and the model can no longer be updated.
+        '''
 
-            val_k = self.mkv_hash.lookup(final_key_partial)
-            self.mkv_hash.update(final_key_partial, val_k + 1)
+        if self.length >= self.order:
+            self.count_grams(self.tail + self.head)
+        else:
+            # The whole text is in head
+            for key_full in short_grams(self.head, self.order):
+                self.mkv_hash.increment(key_full)
+                self.mkv_hash.increment(key_full[:-1])
+        self.finished = True
+        self.mkv_hash.shrink()
+
+    def count_grams(self, buffer_str):
+        '''
+        Count the k token and k+1 token of every position of a string that
+        is preceded by at least k characters
+
+        Input: buffer_str(str): the characters to count, the first k of
+                                which only serve as context
+        '''
+
+        count_tokens(self.mkv_hash, buffer_str, self.order)
 
     def log_probability(self,s):
         '''
@@ -67,29 +247,583 @@ class Markov:
                                       of a match.
         '''
 
-        length_test = len(s)
-        S_val = len(set(self.training_str))
+        if len(s) < self.order:
+            return self.short_log_probability(s)
+
+        gram_log_prob = self.gram_log_prob
         agg_log_prob = 0
 
-        for i in range(length_test):
-            front_cut = i - self.order
-            if front_cut < 0:
-                first_half = s[length_test + front_cut:]
-                last_half = s[:i + 1]
-                final_key = first_half + last_half
-            else:
-                final_key = s[front_cut:i+1]
+        for key_k, hash_k, key_full, hash_full in rolling_grams(
+                wrap_around(s, self.order), self.order):
+            agg_log_prob += gram_log_prob(key_k, hash_k, key_full, hash_full)
 
-            N_val = self.mkv_hash.lookup(final_key[:self.order])
-            M_val = self.mkv_hash.lookup(final_key)
+        return agg_log_prob
 
-            prob_val = math.log(((M_val + 1) / (N_val + S_val)))
+    def short_log_probability(self, s):
+        '''
+        Log probability of a string shorter than the order of the model,
+        with the tokens of short_grams. These may not be k or k+1 tokens,
+        so the counts are always looked up (never the compiled table).
 
-            agg_log_prob += prob_val
+        Input: s(str): a string of fewer than k characters
+
+        Output: agg_log_prob(float): the aggregate log probability
+        '''
+
+        S_val = len(self.chars)
+        agg_log_prob = 0
+
+        for key_full in short_grams(s, self.order):
+            N_val = self.mkv_hash.lookup(key_full[:self.order])
+            M_val = self.mkv_hash.lookup(key_full)
+            agg_log_prob += math.log(((M_val + 1) / (N_val + S_val)))
 
         return agg_log_prob
 
-def identify_speaker(speech1, speech2, speech3, order):
+    def log_probability_parallel(self, s, processes=None, chunks=None,
+                                 model_path=None):
+        '''
+        Same as log_probability, but scores the positions of "s" in several
+        processes. The wrapped string is split into chunks that overlap by
+        k characters, so every position is scored with its full context,
+        and each worker returns the terms of its chunk, which are added up
+        here in order. The result is therefore bit for bit the same as
+        that of log_probability.
+
+        Input:  s(str): string containing a speech from an unknown source
+                processes(int): number of worker processes (default: one
+                                per core)
+                chunks(int): number of chunks (default: one per process)
+                model_path(str): file this model was saved to or loaded
+                                 from; if given, workers memory-map it
+                                 instead of receiving a copy of the model
+
+        Output: agg_log_prob(float): the aggregate log probability
+        '''
+
+        k = self.order
+        if len(s) < k:
+            return self.short_log_probability(s)
+
+        wrapped_str = wrap_around(s, k)
+        positions = len(s)
+        if chunks is None:
+            chunks = processes or os.cpu_count() or 1
+        bounds = [k + positions * j // chunks for j in range(chunks + 1)]
+        chunk_strs = [wrapped_str[bounds[j] - k:bounds[j + 1]]
+                      for j in range(chunks) if bounds[j] < bounds[j + 1]]
+
+        if model_path is None:
+            initargs = (self, None)
+        else:
+            initargs = (None, model_path)
+
+        agg_log_prob = 0
+        with concurrent.futures.ProcessPoolExecutor(
+                processes, initializer=init_scorer,
+                initargs=initargs) as executor:
+            for terms in executor.map(score_chunk, chunk_strs):
+                for term in terms:
+                    agg_log_prob += term
+
+        return agg_log_prob
+
+    def gram_log_prob(self, key_k, hash_k, key_full, hash_full):
+        '''
+        Log probability of one position of a text: the probability of its
+        k+1 token given the k token preceding it, with add-one smoothing
+        over the alphabet of the training text. Uses the compiled table if
+        compile has been called.
+
+        Input:  key_k(str), hash_k(int): the k token and its hash
+                key_full(str), hash_full(int): the k+1 token and its hash
+
+        Output: (float): log((M + 1) / (N + S))
+        '''
+
+        if self.compiled is not None:
+            log_prob = self.compiled.lookup(key_full, hash_full)
+            if log_prob is None:
+                log_prob = self.compiled.lookup(key_k, hash_k)
+                if log_prob is None:
+                    log_prob = self.unseen_log_prob
+            return log_prob
+
+        N_val = self.mkv_hash.lookup(key_k, hash_k)
+        M_val = self.mkv_hash.lookup(key_full, hash_full)
+
+        return math.log(((M_val + 1) / (N_val + len(self.chars))))
+
+    def compile(self):
+        '''
+        Freeze the trained counts into a table of log probabilities, so
+        that scoring a position takes a single lookup in most cases: each
+        k+1 token maps to its log probability, and each k token maps to
+        the log probability of an unseen k+1 token in that context. Tokens
+        whose context was never seen either get unseen_log_prob.
+
+        The model must not be trained any further once compiled, and its
+        counts must be exact (not a Count_Min_Sketch).
+        '''
+
+        check_enumerable(self.mkv_hash, "compiled")
+
+        S_val = len(self.chars)
+        compiled = Hash_Table.Compact_Hash_Table.with_capacity(
+            len(self.mkv_hash), None)
+
+        for key, count in self.mkv_hash.items():
+            if len(key) == self.order:
+                log_prob = math.log(1 / (count + S_val))
+            else:
+                N_val = self.mkv_hash.lookup(key[:self.order])
+                log_prob = math.log((count + 1) / (N_val + S_val))
+            compiled.update(key, log_prob)
+
+        self.unseen_log_prob = math.log(1 / S_val) if S_val else 0.0
+        self.compiled = compiled
+
+    def save(self, path):
+        '''
+        Write the trained model to "path" as sorted tokens and counts
+        (see Model_File for the format), so that it can be memory-mapped
+        back by load instead of being trained again
+
+        Input: path(str): the file to write
+        '''
+
+        check_enumerable(self.mkv_hash, "saved")
+
+        # Strings compare by code point, as their records compare as bytes
+        k_items = []
+        full_items = []
+        for key, count in self.mkv_hash.items():
+            if len(key) == self.order:
+                k_items.append((key, count))
+            else:
+                full_items.append((key, count))
+        k_items.sort()
+        full_items.sort()
+
+        Model_File.write_model(
+            path, self.order, sorted(map(ord, self.chars)),
+            b"".join(Model_File.encode_key(key) for key, _ in k_items),
+            array("q", [count for _, count in k_items]),
+            b"".join(Model_File.encode_key(key) for key, _ in full_items),
+            array("q", [count for _, count in full_items]))
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Load a model written by save (or by Numpy_Markov.save). The counts
+        stay in a memory map of the file and are binary searched on lookup.
+
+        Input: path(str): the model file
+
+        Output: (Markov): a model ready to score texts
+        '''
+
+        header, arrays = Model_File.read_model(path)
+        model = cls(header["order"], "")
+        model.training_str = None
+        model.chars = set(map(chr, header["alphabet"]))
+        model.mkv_hash = Model_File.Mapped_Counts(
+            header["order"], header["alphabet"], *arrays)
+
+        return model
+
+
+class Multi_Order_Markov:
+    '''
+    Markov models of every order 0..K trained in a single pass over the
+    text. One hash table holds the counts of every token of length 0 to
+    K+1; since a token's count does not depend on the order of the model
+    it is used by, the table answers for any order k <= K exactly as
+    Markov(k, s) would.
+    '''
+
+    def __init__(self, max_k, s):
+        '''
+        Construct models of orders 0 to max_k using the statistics of
+        string "s"
+
+        Input:  max_k(int): the highest order that can be scored
+                s(str): string containing speech of a known candidate
+        '''
+
+        self.mkv_hash = Hash_Table.Compact_Hash_Table(HASH_CELLS, 0)
+        self.training_str = s
+        self.max_order = max_k
+        self.chars = set(s)
+
+    def get_counts(self):
+        '''
+        Count every token of length 1 to K+1 ending on each position of the
+        (circular) training text, plus the empty token used by order 0
+
+        Input: N/A [Inplace Modification of Hash Table]
+        Output: N/A [Inplace Modification of Hash Table]
+        '''
+
+        base = Hash_Table.HASH_BASE
+        mod = Hash_Table.HASH_MOD
+        max_len = self.max_order + 1
+        if len(self.mkv_hash) == 0:
+            self.mkv_hash = Hash_Table.Compact_Hash_Table.with_capacity(
+                estimate_keys(self.training_str, range(max_len + 1)), 0)
+        weights = [pow(base, length, mod) for length in range(max_len)]
+        wrapped_str = wrap_around(self.training_str, self.max_order)
+
+        for i in range(self.max_order, len(wrapped_str)):
+            # Grow the token leftwards from position i, extending its hash
+            # with one more leading character each time
+            hash_val = 0
+            for length in range(max_len):
+                start = i - length
+                hash_val = (ord(wrapped_str[start]) * weights[length] +
+                            hash_val) % mod
+                self.mkv_hash.increment(wrapped_str[start:i + 1], 1, hash_val)
+
+        self.mkv_hash.increment("", len(self.training_str), 0)
+        self.mkv_hash.shrink()
+
+    def at_order(self, k):
+        '''
+        Return a Markov model of order k sharing this model's counts, which
+        can be scored or compared like any trained Markov model
+
+        Input: k(int): an order between 0 and max_k
+
+        Output: (Markov): the order k model
+        '''
+
+        if not 0 <= k <= self.max_order:
+            raise ValueError("order must be between 0 and " +
+                             str(self.max_order))
+
+        model = Markov(k, "")
+        model.training_str = self.training_str
+        model.chars = self.chars
+        model.mkv_hash = self.mkv_hash
+
+        return model
+
+    def log_probability(self, s, order):
+        '''
+        Get the log probability of string "s" under the model of the given
+        order, as Markov(order, training string).log_probability(s) would
+
+        Input:  s(str): string containing a speech from an unknown source
+                order(int): an order between 0 and max_k
+
+        Output: (float): the aggregate log probability
+        '''
+
+        return self.at_order(order).log_probability(s)
+
+
+def estimate_keys(s, lengths):
+    '''
+    Estimate the number of distinct tokens of the given lengths in a text,
+    to size its table before counting: the distinct tokens of its first
+    ESTIMATE_SAMPLE characters are scaled up to the whole text. New tokens
+    get rarer further into a text, so this errs on the high side, but it
+    never exceeds one token of each length per position.
+
+    Input:  s(str): the text to be counted
+            lengths(iterable): the lengths of the tokens counted
+
+    Output: (int): the estimated number of distinct tokens
+    '''
+
+    sample = s[:ESTIMATE_SAMPLE]
+    if not sample:
+        return 0
+    lengths = list(lengths)
+    distinct = sum(len({sample[i:i + length]
+                        for i in range(len(sample) - length + 1)})
+                   for length in lengths)
+
+    return min(distinct * len(s) // len(sample), len(lengths) * len(s))
+
+
+def check_enumerable(store, action):
+    '''
+    Make sure the tokens of a count store can be listed, which compile and
+    save need but an approximate store such as Count_Min_Sketch, which
+    does not keep its keys, cannot do
+
+    Input:  store: the counts of a model
+            action(str): what is being done with the model, for the error
+    '''
+
+    if not hasattr(store, "items"):
+        raise ValueError("a model counted in a " + type(store).__name__ +
+                         " cannot be " + action + ": its tokens are not "
+                         "stored")
+
+
+def count_shard(shard_str, k, table=None):
+    '''
+    Count the k and k+1 tokens of one shard for Markov.get_counts_parallel
+
+    Input:  shard_str(str): part of a wrapped string, whose first k
+                            characters only serve as context
+            k(int): the order of the model
+            table: empty store to count into (default: a new
+                   Compact_Hash_Table)
+
+    Output: the counts of the shard
+    '''
+
+    if table is None:
+        table = Hash_Table.Compact_Hash_Table.with_capacity(
+            estimate_keys(shard_str, [k, k + 1]), 0)
+    count_tokens(table, shard_str, k)
+    table.shrink()
+
+    return table
+
+
+def init_scorer(model, model_path):
+    '''
+    Set the model of a worker process of Markov.log_probability_parallel
+
+    Input:  model(Markov): the model, or None to load it from model_path
+            model_path(str): a file written by Markov.save
+    '''
+
+    global scoring_model
+    if model is None:
+        model = Markov.load(model_path)
+    scoring_model = model
+
+
+def score_chunk(chunk_str):
+    '''
+    Log probability of every position of one chunk under the model of the
+    worker, for Markov.log_probability_parallel
+
+    Input: chunk_str(str): part of a wrapped string, whose first k
+                           characters only serve as context
+
+    Output: (array): the log probability of each position, in order
+    '''
+
+    gram_log_prob = scoring_model.gram_log_prob
+    return array("d", [gram_log_prob(*gram) for gram in
+                       rolling_grams(chunk_str, scoring_model.order)])
+
+
+def count_tokens(table, buffer_str, k):
+    '''
+    Increment, in "table", the k token and k+1 token of every position of
+    a string that is preceded by at least k characters
+
+    Input:  table(Compact_Hash_Table): the counts to update
+            buffer_str(str): the characters to count, the first k of which
+                             only serve as context
+            k(int): the order of the model
+    '''
+
+    for key_k, hash_k, key_full, hash_full in rolling_grams(buffer_str, k):
+        table.increment(key_full, 1, hash_full)
+        table.increment(key_k, 1, hash_k)
+
+
+def count_spans(table, k):
+    '''
+    Increment, in a Span_Hash_Table, the k token and k+1 token of every
+    position of its text that is preceded by at least k characters, with
+    the same rolling hashes as rolling_grams but without slicing the keys
+
+    Input:  table(Span_Hash_Table): the counts to update
+            k(int): the order of the model
+    '''
+
+    base = Hash_Table.HASH_BASE
+    mod = Hash_Table.HASH_MOD
+    lead_weight = pow(base, k, mod)
+    codes = table.codes
+    increment_span = table.increment_span
+
+    hash_k = 0
+    for code in codes[:k]:
+        hash_k = (hash_k * base + code) % mod
+
+    for i in range(k, len(codes)):
+        hash_full = (hash_k * base + codes[i]) % mod
+        increment_span(i - k, k + 1, 1, hash_full)
+        increment_span(i - k, k, 1, hash_k)
+        hash_k = (hash_full - codes[i - k] * lead_weight) % mod
+
+
+def wrap_around(s, k):
+    '''
+    Prefix string "s" with its own last k characters, so that the k+1
+    tokens at the start of the string wrap around to its end, as the
+    model treats every text as circular
+
+    Input:  s(str): the text to wrap
+            k(int): the order of the model (at most len(s); texts shorter
+                    than k are handled by short_grams instead)
+
+    Output: (str): s[-k:] + s, of length len(s) + k
+    '''
+
+    if len(s) < k:
+        raise ValueError("a text of " + str(len(s)) + " characters cannot "
+                         "be wrapped around for order " + str(k))
+
+    return s[len(s) - k:] + s
+
+
+def short_grams(s, k):
+    '''
+    The k+1 token of every position of a string shorter than k, built
+    exactly as the original implementation built it: the context of
+    position i is s[len(s) + i - k:] (a negative index, so at most the
+    whole string) followed by s[:i]. The tokens may thus be shorter than
+    k + 1 characters. As in the original, training counts each token and
+    its context (all but its last character), while scoring looks up each
+    token and its first k characters.
+
+    Input:  s(str): a string of fewer than k characters
+            k(int): the order of the model
+
+    Output: generator of str
+    '''
+
+    length = len(s)
+    for i in range(length):
+        yield s[length + i - k:] + s[:i + 1]
+
+
+def rolling_grams(wrapped_str, k):
+    '''
+    Slide a window of k+1 characters over a wrapped string and yield, for
+    every position of the original string, the k token preceding it and
+    the k+1 token ending on it, along with their full hash values. The
+    hashes are updated in constant time per position (Rabin-Karp) and are
+    equal to what Compact_Hash_Table.gen_hash returns for the same keys.
+
+    Input:  wrapped_str(str): a string returned by wrap_around
+            k(int): the order of the model
+
+    Output: generator of (key_k, hash_k, key_full, hash_full) tuples
+    '''
+
+    base = Hash_Table.HASH_BASE
+    mod = Hash_Table.HASH_MOD
+    lead_weight = pow(base, k, mod)
+
+    hash_k = 0
+    for letter in wrapped_str[:k]:
+        hash_k = (hash_k * base + ord(letter)) % mod
+
+    for i in range(k, len(wrapped_str)):
+        hash_full = (hash_k * base + ord(wrapped_str[i])) % mod
+        yield (wrapped_str[i - k:i], hash_k,
+               wrapped_str[i - k:i + 1], hash_full)
+        hash_k = (hash_full - ord(wrapped_str[i - k]) * lead_weight) % mod
+
+
+def model_class(backend):
+    '''
+    Return the model class implementing one of the BACKENDS: "hash" for
+    Markov, "numpy" for the vectorized Numpy_Markov (imported here so that
+    NumPy is only needed when it is selected), "word" for the word-level
+    Word_Markov
+
+    Input: backend(str): one of BACKENDS
+
+    Output: (class): Markov, Numpy_Markov.Numpy_Markov or
+            Word_Markov.Word_Markov
+    '''
+
+    if backend == "hash":
+        return Markov
+    if backend == "numpy":
+        import Numpy_Markov
+        return Numpy_Markov.Numpy_Markov
+    if backend == "word":
+        import Word_Markov
+        return Word_Markov.Word_Markov
+    raise ValueError("unknown backend " + repr(backend) +
+                     ", expected one of " + ", ".join(BACKENDS))
+
+
+def backend_saves(backend):
+    '''
+    Whether models of a backend can be saved, and so be reused from a
+    model directory by load_or_train ("word" models cannot)
+
+    Input: backend(str): one of BACKENDS
+
+    Output: (bool)
+    '''
+
+    return hasattr(model_class(backend), "save")
+
+
+def make_model(order, speech, backend="hash"):
+    '''
+    Construct and train a model of the given order on a speech, using one
+    of the BACKENDS (see model_class)
+
+    Input:  order(int): indicates the kth-order Markov model
+            speech(str): the training text
+            backend(str): one of BACKENDS
+
+    Output: a trained model of the class returned by model_class
+    '''
+
+    model = model_class(backend)(order, speech)
+    model.get_counts()
+    return model
+
+
+def load_or_train(path, order, backend="hash", model_dir=None):
+    '''
+    Build the model of the speech stored in file "path". When model_dir is
+    given, a model saved there by a previous call is loaded instead of
+    training again, unless the speech file has changed since; otherwise the
+    freshly trained model is saved there for next time.
+
+    Input:  path(str): file containing the training speech
+            order(int): indicates the kth-order Markov model
+            backend(str): one of BACKENDS
+            model_dir(str): directory of saved models, or None
+
+    Output: a trained model of the class returned by model_class
+    '''
+
+    if model_dir is not None and not backend_saves(backend):
+        raise ValueError("models of the " + backend + " backend cannot be "
+                         "saved")
+
+    if model_dir is not None:
+        model_path = os.path.join(model_dir, os.path.basename(path) + "." +
+                                  str(order) + ".mkv")
+        if (os.path.exists(model_path) and
+                os.path.getmtime(model_path) >= os.path.getmtime(path)):
+            try:
+                return model_class(backend).load(model_path)
+            except ValueError:
+                # Saved in an older format: trained again and overwritten
+                pass
+
+    with open(path) as f:
+        model = make_model(order, f.read(), backend)
+
+    if model_dir is not None:
+        os.makedirs(model_dir, exist_ok=True)
+        model.save(model_path)
+
+    return model
+
+
+def identify_speaker(speech1, speech2, speech3, order, backend="hash"):
     '''
     Given sample text from two speakers, and text from an unidentified speaker,
     return a tuple with the *normalized* log probabilities of each of the speakers
@@ -102,6 +836,8 @@ def identify_speaker(speech1, speech2, speech3, order):
             Speech3(str): contains a speech from unknown source which
                           the function will attempt to attribute the speaker
             order(int): indicates the kth-order Markov model
+            backend(str): which model implementation to use, one of
+                          BACKENDS (see make_model)
 
     Output: (speaker_likelihood_1, speaker_likelihood_2, "*")(tuple):
                 a tuple containing the likelihood of each speaker
@@ -110,11 +846,23 @@ def identify_speaker(speech1, speech2, speech3, order):
                 the final decision
     '''
 
-    speaker_model_1 = Markov(order,speech1)
-    speaker_model_2 = Markov(order,speech2)
+    speaker_model_1 = make_model(order, speech1, backend)
+    speaker_model_2 = make_model(order, speech2, backend)
+
+    return compare_speakers(speaker_model_1, speaker_model_2, speech3)
 
-    speaker_model_1.get_counts()
-    speaker_model_2.get_counts()
+
+def compare_speakers(speaker_model_1, speaker_model_2, speech3):
+    '''
+    Same as identify_speaker, for two models that are already trained
+
+    Input:  speaker_model_1, speaker_model_2: trained models of speakers
+                                              A and B
+            Speech3(str): contains a speech from unknown source
+
+    Output: (speaker_likelihood_1, speaker_likelihood_2, "*")(tuple):
+                see identify_speaker
+    '''
 
     length_unknown = len(speech3)
 
@@ -131,6 +879,115 @@ def identify_speaker(speech1, speech2, speech3, order):
         return (speaker_likelihood_1, speaker_likelihood_2, "A or B")
 
 
+def speech_models(order, backend="hash", model_dir=None):
+    '''
+    Train (or load, see load_or_train) a model of every speaker of the
+    bundled speeches/<name>1+2.txt files, as an example set of candidates
+    for identify_among
+
+    Input:  order(int): indicates the kth-order Markov model
+            backend(str): one of BACKENDS
+            model_dir(str): directory of saved models, or None
+
+    Output: models(dict): maps each speaker name to its model
+    '''
+
+    models = {}
+    for name in sorted(os.listdir(SPEECH_DIR)):
+        if name.endswith("1+2.txt"):
+            models[name[:-len("1+2.txt")]] = load_or_train(
+                os.path.join(SPEECH_DIR, name), order, backend, model_dir)
+
+    return models
+
+
+def identify_among(models, text, order, top_n=None):
+    '''
+    Rank any number of candidate speakers for a text. The k and k+1 tokens
+    of the text (and their hashes) are extracted once, and every position
+    is scored against all the models in the same pass.
+
+    Input:  models(dict): maps each speaker name to a trained model of the
+                          given order
+            text(str): contains a speech from unknown source
+            order(int): indicates the kth-order Markov model
+            top_n(int): number of speakers to return (default: all)
+
+    Output: ranking(list): (name, likelihood, posterior) tuples, best
+            first, where likelihood is the log probability normalized by
+            the length of the text (as in identify_speaker) and posterior
+            is the probability of the speaker given the text, assuming all
+            candidates are equally likely beforehand
+    '''
+
+    names = list(models)
+    for name in names:
+        if models[name].order != order:
+            raise ValueError("the model of " + name + " is not of order " +
+                             str(order))
+
+    # Models without a per-position scorer (Numpy_Markov) score the whole
+    # text at once instead, as do all models for texts shorter than the
+    # order, which cannot be wrapped around
+    totals = [0] * len(names)
+    scorers = []
+    for j, name in enumerate(names):
+        if len(text) >= order and hasattr(models[name], "gram_log_prob"):
+            scorers.append((j, models[name].gram_log_prob))
+        else:
+            totals[j] = models[name].log_probability(text)
+
+    if scorers:
+        for gram in rolling_grams(wrap_around(text, order), order):
+            for j, gram_log_prob in scorers:
+                totals[j] += gram_log_prob(*gram)
+
+    best = max(totals) if totals else 0
+    weights = [math.exp(total - best) for total in totals]
+    weight_sum = sum(weights)
+    length = max(len(text), 1)
+    ranking = sorted(((names[j], totals[j] / length,
+                       weights[j] / weight_sum) for j in range(len(names))),
+                     key=lambda entry: entry[1], reverse=True)
+
+    return ranking[:top_n]
+
+
+def instrumented_model(path, order):
+    '''
+    Train a Markov model whose counts are kept in an
+    Instrumented_Hash_Table, so that stats() can be printed after scoring
+
+    Input:  path(str): file containing the training speech
+            order(int): indicates the kth-order Markov model
+
+    Output: (Markov): the trained model
+    '''
+
+    with open(path) as f:
+        speech = f.read()
+    model = Markov(order, speech,
+                   Hash_Table.Instrumented_Hash_Table.with_capacity(
+                       estimate_keys(speech, [order, order + 1]), 0))
+    model.get_counts()
+
+    return model
+
+
+def print_stats(name, stats):
+    '''
+    Print the figures returned by Instrumented_Hash_Table.stats
+    '''
+
+    print(name + " table:")
+    for field, value in stats.items():
+        if field != "probe_histogram":
+            print("  {:<18} {}".format(field, value))
+    print("  probe_histogram")
+    for length, count in stats["probe_histogram"].items():
+        print("    {:>4} {:>10}".format(length, count))
+
+
 def print_results(res_tuple):
     '''
     Given a tuple from identify_speaker, print formatted results to the screen
@@ -146,24 +1003,44 @@ def print_results(res_tuple):
 
 
 if __name__=="__main__":
-    num_args = len(sys.argv)
-
-    if num_args != 5:
-        print("usage: python3 " + sys.argv[0] + " <file name for speaker A> " +
-              "<file name for speaker B>\n  <file name of text to identify> " +
-              "<order>")
-        sys.exit(0)
-    
-    with open(sys.argv[1], "rU") as file1:
-        speech1 = file1.read()
+    parser = argparse.ArgumentParser(
+        description="Attribute a text to one of two speakers")
+    parser.add_argument("speaker_a", help="file name for speaker A")
+    parser.add_argument("speaker_b", help="file name for speaker B")
+    parser.add_argument("unknown", help="file name of text to identify")
+    parser.add_argument("order", type=int)
+    parser.add_argument("--backend", choices=BACKENDS, default="hash",
+                        help="model implementation (default: hash)")
+    parser.add_argument("--model-dir",
+                        help="directory where trained speaker models are "
+                             "saved and reused by later runs")
+    parser.add_argument("--stats", action="store_true",
+                        help="train instrumented hash tables and print "
+                             "their probe and resize statistics")
+    args = parser.parse_args()
 
-    with open(sys.argv[2], "rU") as file2:
-        speech2 = file2.read()
+    if args.model_dir is not None and not backend_saves(args.backend):
+        parser.error("models of the " + args.backend + " backend cannot be "
+                     "saved to --model-dir")
+    if args.stats:
+        if args.backend != "hash" or args.model_dir is not None:
+            parser.error("--stats needs freshly trained hash models")
+        speaker_model_1 = instrumented_model(args.speaker_a, args.order)
+        speaker_model_2 = instrumented_model(args.speaker_b, args.order)
+    else:
+        speaker_model_1 = load_or_train(args.speaker_a, args.order,
+                                        args.backend, args.model_dir)
+        speaker_model_2 = load_or_train(args.speaker_b, args.order,
+                                        args.backend, args.model_dir)
 
-    with open(sys.argv[3], "rU") as file3:
+    with open(args.unknown) as file3:
         speech3 = file3.read()
 
-    res_tuple = identify_speaker(speech1, speech2, speech3, int(sys.argv[4]))
+    res_tuple = compare_speakers(speaker_model_1, speaker_model_2, speech3)
 
     print_results(res_tuple)
 
+    if args.stats:
+        print("")
+        print_stats("Speaker A", speaker_model_1.mkv_hash.stats())
+        print_stats("Speaker B", speaker_model_2.mkv_hash.stats())
@@ -0,0 +1,206 @@
+# CS122 W'20: Markov models and hash tables
+# On-disk format for trained Markov models
+#
+# A model file holds an 8-byte magic string, the length of a JSON header,
+# the header itself (order, alphabet, array sizes) padded to 8 bytes, and
+# then four arrays: the sorted k tokens, their counts, the sorted k+1
+# tokens and their counts. A token is stored as a fixed-width record of
+# its characters in big-endian UTF-32, so that records sort as bytes in
+# the same order as the strings themselves and a model of any order can
+# be saved; each array of records is padded to 8 bytes. Counts are
+# little-endian int64. The arrays are read straight from a memory map, so
+# loading a model copies nothing.
+
+import sys
+import json
+import mmap
+from bisect import bisect_left
+
+MAGIC = b"MKVMODL2"
+RECORD_BYTES = 4
+
+
+def check_byteorder():
+    '''
+    Counts are written and mapped without conversion, which is only
+    correct on little-endian machines
+    '''
+
+    if sys.byteorder != "little":
+        raise ValueError("model files are only supported on little-endian "
+                         "machines")
+
+
+def encode_key(key):
+    '''
+    Turn a token into its record
+
+    Input: key(str): the token
+
+    Output: (bytes): RECORD_BYTES bytes per character of key
+    '''
+
+    return key.encode("utf-32-be")
+
+
+def write_model(path, order, alphabet, k_records, k_counts, full_records,
+                full_counts):
+    '''
+    Write a trained model to "path"
+
+    Input:  path(str): the file to write
+            order(int): the order of the model
+            alphabet(list): sorted code points of the training characters
+            k_records, full_records(bytes): the records of the k and k+1
+                tokens (see encode_key), concatenated in sorted order
+            k_counts, full_counts: contiguous int64 buffers (array('q') or
+                int64 ndarrays), the count of each record
+    '''
+
+    check_byteorder()
+    header = json.dumps({"order": order,
+                         "alphabet": [int(point) for point in alphabet],
+                         "k_size": len(k_counts),
+                         "full_size": len(full_counts)}).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for records, counts, length in ((k_records, k_counts, order),
+                                        (full_records, full_counts,
+                                         order + 1)):
+            if len(records) != len(counts) * length * RECORD_BYTES:
+                raise ValueError("expected one record of " + str(length) +
+                                 " characters per count")
+            f.write(records)
+            f.write(b"\0" * (-len(records) % 8))
+            view = memoryview(counts)
+            if view.itemsize != 8 or not view.c_contiguous:
+                raise ValueError("model counts must be contiguous int64")
+            f.write(view.cast("B"))
+
+
+def read_model(path):
+    '''
+    Memory-map a model file written by write_model
+
+    Input: path(str): the file to read
+
+    Output: (header, arrays)(tuple): the header as a dict, and the four
+            arrays (k_records, k_counts, full_records, full_counts) as
+            memoryviews over the memory map: bytes for the records, int64
+            for the counts
+    '''
+
+    check_byteorder()
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(path + " is not a Markov model file of this "
+                         "version")
+    header_len = int.from_bytes(mapped[8:16], "little")
+    header = json.loads(mapped[16:16 + header_len].decode("utf-8"))
+
+    view = memoryview(mapped)
+    offset = 16 + header_len
+    arrays = []
+    for size, length in ((header["k_size"], header["order"]),
+                         (header["full_size"], header["order"] + 1)):
+        records_len = size * length * RECORD_BYTES
+        arrays.append(view[offset:offset + records_len])
+        offset += records_len + (-records_len % 8)
+        arrays.append(view[offset:offset + 8 * size].cast("q"))
+        offset += 8 * size
+
+    return header, arrays
+
+
+class Records:
+    '''
+    Read-only sequence of the fixed-width records of a buffer, as bytes,
+    so that they can be binary searched with bisect
+    '''
+
+    def __init__(self, buffer, size, length):
+        '''
+        Input:  buffer: the concatenated records
+                size(int): number of records
+                length(int): number of characters of every record
+        '''
+
+        self.buffer = buffer
+        self.size = size
+        self.width = length * RECORD_BYTES
+
+    def __getitem__(self, idx):
+        return bytes(self.buffer[idx * self.width:(idx + 1) * self.width])
+
+    def __len__(self):
+        return self.size
+
+
+class Mapped_Counts:
+    '''
+    Read-only token counts backed by the arrays of a model file, with the
+    same lookup interface as the hash tables so that Markov can score with
+    it directly. A lookup binary searches the records of the token length.
+    '''
+
+    def __init__(self, order, alphabet, k_records, k_counts, full_records,
+                 full_counts):
+        '''
+        Input:  order(int): the order of the model
+                alphabet(list): sorted code points of the training characters
+                k_records, k_counts, full_records, full_counts: the arrays
+                    returned by read_model
+        '''
+
+        self.order = order
+        self.alphabet = alphabet
+        self.k_records = Records(k_records, len(k_counts), order)
+        self.k_counts = k_counts
+        self.full_records = Records(full_records, len(full_counts),
+                                    order + 1)
+        self.full_counts = full_counts
+
+    def lookup(self, key, hash_val=None):
+        '''
+        Retrieve the count of a token, or 0 if it was never seen
+
+        Input:  key(str): a k or k+1 token
+                hash_val(int): ignored, accepted for compatibility with
+                               the hash tables
+
+        Output: (int): the count of key
+        '''
+
+        if len(key) == self.order:
+            records, counts = self.k_records, self.k_counts
+        elif len(key) == self.order + 1:
+            records, counts = self.full_records, self.full_counts
+        else:
+            return 0
+
+        record = encode_key(key)
+        idx = bisect_left(records, record)
+        if idx < len(records) and records[idx] == record:
+            return counts[idx]
+        return 0
+
+    def items(self):
+        '''
+        Iterate over the (token, count) pairs of the model, k tokens first
+
+        Output: generator of (key, count) tuples
+        '''
+
+        for records, counts in ((self.k_records, self.k_counts),
+                                (self.full_records, self.full_counts)):
+            for idx in range(len(records)):
+                yield records[idx].decode("utf-32-be"), counts[idx]
+
+    def __len__(self):
+        return len(self.k_counts) + len(self.full_counts)
@@ -0,0 +1,252 @@
+# CS122 W'20: Markov models and hash tables
+# Vectorized NumPy backend for the character-based Markov model
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import Markov
+import Model_File
+
+
+def as_records(windows):
+    '''
+    View every row of a 2-D array of big-endian UTF-32 code points as one
+    token record (see Model_File), which NumPy sorts and compares as bytes
+
+    Input: windows(ndarray): one token of equal length per row
+
+    Output: (ndarray): one void record per row
+    '''
+
+    rows, length = windows.shape
+    if length == 0:
+        # NumPy has no zero-width records; every empty token is the same
+        return np.zeros(rows, dtype="V1")
+
+    # Records compare as bytes only if the code points are big-endian
+    return np.ascontiguousarray(windows, dtype=">u4").view(
+        np.dtype((np.void, Model_File.RECORD_BYTES * length))).ravel()
+
+
+def records_from_buffer(buffer, size, length):
+    '''
+    View the concatenated records of a model file as an array, without
+    copying them
+
+    Input:  buffer: the records, as returned by Model_File.read_model
+            size(int): number of records
+            length(int): number of characters of every record
+
+    Output: (ndarray): one void record per token
+    '''
+
+    if length == 0:
+        return np.zeros(size, dtype="V1")
+
+    return np.frombuffer(buffer, dtype=np.dtype(
+        (np.void, Model_File.RECORD_BYTES * length)))
+
+
+def records_to_bytes(records, length):
+    '''
+    Output: (bytes): the records of tokens of "length" characters as they
+            are written to a model file
+    '''
+
+    return records.tobytes() if length else b""
+
+
+class Numpy_Markov:
+    '''
+    Drop-in replacement for Markov.Markov that counts k and k+1 tokens
+    with NumPy instead of a Python loop over a hash table. Each token is a
+    fixed-width record of its code points (the format of Model_File), so
+    counting is a sort (np.unique) and looking a token up is a binary
+    search (np.searchsorted), for any order. Gives the same log
+    probabilities as Markov.
+    '''
+
+    def __init__(self, k, s):
+        '''
+        Construct a new k-order Markov model using the statistics of string "s"
+
+        Input:  k(int): integer denoting the kth-order of the Markov model
+                s(str): string containing speech of a known candidate,
+                        used for 'training' our model for comparions later
+        '''
+
+        self.training_str = s
+        self.order = k
+
+        self.alphabet = np.array(sorted(set(map(ord, s))), dtype=np.int64)
+
+        self.k_records = as_records(np.zeros((0, k), dtype=">u4"))
+        self.k_counts = np.zeros(0, dtype=np.int64)
+        self.full_records = as_records(np.zeros((0, k + 1), dtype=">u4"))
+        self.full_counts = np.zeros(0, dtype=np.int64)
+
+    def save(self, path):
+        '''
+        Write the trained model to "path" (see Model_File for the format)
+
+        Input: path(str): the file to write
+        '''
+
+        Model_File.write_model(
+            path, self.order, self.alphabet,
+            records_to_bytes(self.k_records, self.order), self.k_counts,
+            records_to_bytes(self.full_records, self.order + 1),
+            self.full_counts)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Load a model written by save (or by Markov.save). The record and
+        count arrays are views over a memory map of the file, so nothing is
+        copied.
+
+        Input: path(str): the model file
+
+        Output: (Numpy_Markov): a model ready to score texts
+        '''
+
+        header, arrays = Model_File.read_model(path)
+        order = header["order"]
+        model = cls(order, "".join(map(chr, header["alphabet"])))
+        model.training_str = None
+        model.k_records = records_from_buffer(arrays[0], header["k_size"],
+                                              order)
+        model.k_counts = np.frombuffer(arrays[1], dtype=np.int64)
+        model.full_records = records_from_buffer(
+            arrays[2], header["full_size"], order + 1)
+        model.full_counts = np.frombuffer(arrays[3], dtype=np.int64)
+
+        return model
+
+    def encode(self, s):
+        '''
+        Encode a string into big-endian UTF-32 code points, prefixed with
+        its own last k characters (see Markov.wrap_around)
+
+        Input: s(str): the text to encode, of at least k characters
+
+        Output: points(ndarray): uint32 array of length len(s) + k
+        '''
+
+        if len(s) < self.order:
+            raise ValueError("a text of " + str(len(s)) + " characters "
+                             "cannot be wrapped around for order " +
+                             str(self.order))
+        points = np.frombuffer(Model_File.encode_key(s), dtype=">u4")
+
+        return np.concatenate((points[len(points) - self.order:], points))
+
+    def tokens(self, points):
+        '''
+        Build the records of the k token preceding every position of an
+        encoded text, and of the k+1 token ending on it
+
+        Input: points(ndarray): an array returned by encode
+
+        Output: (k_tokens, full_tokens)(tuple of ndarrays): the records of
+                the tokens of every position of the original text
+        '''
+
+        windows = sliding_window_view(points, self.order + 1)
+
+        return as_records(windows[:, :self.order]), as_records(windows)
+
+    def get_counts(self):
+        '''
+        Count every k and k+1 token of the training text, keeping them as
+        sorted arrays of records and their counts
+        '''
+
+        k_tokens, full_tokens = self.tokens(self.encode(self.training_str))
+        self.k_records, self.k_counts = np.unique(k_tokens,
+                                                  return_counts=True)
+        self.full_records, self.full_counts = np.unique(full_tokens,
+                                                        return_counts=True)
+
+    def lookup(self, records, counts, tokens):
+        '''
+        Look up the counts of an array of token records
+
+        Input:  records(ndarray): sorted records of the counted tokens
+                counts(ndarray): count of each record
+                tokens(ndarray): records of the tokens to look up
+
+        Output: (ndarray): the count of every token, 0 if never seen
+        '''
+
+        if len(records) == 0:
+            return np.zeros(len(tokens), dtype=np.int64)
+        idx = np.minimum(np.searchsorted(records, tokens), len(records) - 1)
+
+        return np.where(records[idx] == tokens, counts[idx], 0)
+
+    def log_probability(self, s):
+        '''
+        Get the log probability of string "s", given the statistics of
+        character sequences modeled by this particular Markov model
+        This probability is *not* normalized by the length of the string.
+
+        Input: s(str):  string containing a speech from an unknown source
+
+        Output: agg_log_prob(float):  the aggregate log probability
+        '''
+
+        if len(s) < self.order:
+            return self.short_log_probability(s)
+
+        k_tokens, full_tokens = self.tokens(self.encode(s))
+        N_val = self.lookup(self.k_records, self.k_counts, k_tokens)
+        M_val = self.lookup(self.full_records, self.full_counts,
+                            full_tokens)
+        log_probs = np.log((M_val + 1) / (N_val + len(self.alphabet)))
+
+        # Summed in order, like Markov.log_probability, rather than with the
+        # pairwise summation of np.sum, so both give the same float
+        return sum(log_probs.tolist())
+
+    def key_count(self, key):
+        '''
+        Count of a single token of any length; only k and k+1 tokens were
+        counted, so any other token has a count of 0
+
+        Input: key(str): the token
+
+        Output: (int): its count
+        '''
+
+        if len(key) == self.order:
+            records, counts = self.k_records, self.k_counts
+        elif len(key) == self.order + 1:
+            records, counts = self.full_records, self.full_counts
+        else:
+            return 0
+
+        points = np.frombuffer(Model_File.encode_key(key), dtype=">u4")
+        token = as_records(points.reshape(1, len(key)))
+
+        return int(self.lookup(records, counts, token)[0])
+
+    def short_log_probability(self, s):
+        '''
+        Log probability of a string shorter than the order of the model,
+        with the tokens of Markov.short_grams, as Markov scores it
+
+        Input: s(str): a string of fewer than k characters
+
+        Output: agg_log_prob(float): the aggregate log probability
+        '''
+
+        S_val = len(self.alphabet)
+        agg_log_prob = 0
+
+        for key_full in Markov.short_grams(s, self.order):
+            N_val = self.key_count(key_full[:self.order])
+            M_val = self.key_count(key_full)
+            agg_log_prob += math.log(((M_val + 1) / (N_val + S_val)))
+
+        return agg_log_prob
@@ -0,0 +1,195 @@
+# CS122 W'20: Markov models and hash tables
+# Online attribution of a text stream over a sliding window
+
+import argparse
+from collections import deque
+import Hash_Table
+import Markov
+
+
+class Sliding_Window_Scorer:
+    '''
+    Keeps the log likelihood of the last "window" characters of a text
+    stream under every speaker model. Each new character adds the log
+    probability of its k+1 token under every model and subtracts that of
+    the character leaving the window, so the cost per character does not
+    depend on the window size.
+
+    The first k characters of the stream only build up context: unlike
+    Markov.log_probability, a stream has no end to wrap around to.
+    '''
+
+    def __init__(self, models, window):
+        '''
+        Input:  models(dict): maps each speaker name to a trained Markov
+                              model (hash backend); all of the same order
+                window(int): number of characters scored at a time
+        '''
+
+        if window < 1:
+            raise ValueError("the window must hold at least one character")
+        orders = {model.order for model in models.values()}
+        if len(orders) != 1:
+            raise ValueError("the models must all be of the same order")
+        for name, model in models.items():
+            if not hasattr(model, "gram_log_prob"):
+                raise ValueError("the model of " + name + " cannot be "
+                                 "scored one character at a time")
+
+        self.names = list(models)
+        self.scorers = [models[name].gram_log_prob for name in self.names]
+        self.order = orders.pop()
+        self.window = window
+        self.lead_weight = pow(Hash_Table.HASH_BASE, self.order,
+                               Hash_Table.HASH_MOD)
+
+        self.context = ""
+        self.hash_k = 0
+        self.position = 0
+        self.terms = deque()
+        self.totals = [0.0] * len(self.names)
+
+    def push(self, letter):
+        '''
+        Score one more character of the stream
+
+        Input: letter(str): the next character
+
+        Output: (bool): whether the window is full, i.e. the totals cover
+                        exactly the last "window" characters
+        '''
+
+        base = Hash_Table.HASH_BASE
+        mod = Hash_Table.HASH_MOD
+        self.position += 1
+
+        if len(self.context) < self.order:
+            self.context += letter
+            self.hash_k = (self.hash_k * base + ord(letter)) % mod
+            return False
+
+        hash_full = (self.hash_k * base + ord(letter)) % mod
+        key_full = self.context + letter
+        terms = [gram_log_prob(self.context, self.hash_k, key_full,
+                               hash_full) for gram_log_prob in self.scorers]
+        self.context = key_full[1:]
+        self.hash_k = (hash_full - ord(key_full[0]) * self.lead_weight) % mod
+
+        self.terms.append(terms)
+        if len(self.terms) > self.window:
+            old_terms = self.terms.popleft()
+            for j, term in enumerate(terms):
+                self.totals[j] += term - old_terms[j]
+        else:
+            for j, term in enumerate(terms):
+                self.totals[j] += term
+
+        # Re-add the window from scratch once per window length, so that
+        # rounding errors of the running sums cannot build up over a long
+        # stream; this costs O(1) per character on average
+        if self.position % self.window == 0:
+            self.totals = [sum(column) for column in zip(*self.terms)]
+
+        return len(self.terms) == self.window
+
+    def scores(self):
+        '''
+        Log likelihood of the current window under every model, normalized
+        by the number of characters scored (as in identify_speaker)
+
+        Output: (dict): maps each speaker name to its normalized likelihood
+        '''
+
+        length = max(len(self.terms), 1)
+        return {name: self.totals[j] / length
+                for j, name in enumerate(self.names)}
+
+    def decision(self):
+        '''
+        Output: (str): the name of the most likely speaker of the window
+        '''
+
+        best = max(range(len(self.names)), key=lambda j: self.totals[j])
+        return self.names[best]
+
+
+def timeline(models, chunks, window, step=None):
+    '''
+    Attribute a text stream window by window
+
+    Input:  models(dict): maps each speaker name to a trained Markov model
+            chunks(iterable): the text, as strings of any length
+            window(int): number of characters in each window
+            step(int): number of characters between two windows (default:
+                       the window size, i.e. non-overlapping windows)
+
+    Output: generator of (start, end, name, scores) tuples: the character
+            range of the window in the stream, the most likely speaker and
+            the normalized likelihood of each speaker
+    '''
+
+    scorer = Sliding_Window_Scorer(models, window)
+    step = step or window
+    since_last = 0
+
+    for chunk in chunks:
+        for letter in chunk:
+            full = scorer.push(letter)
+            since_last += 1
+            if full and since_last >= step:
+                since_last = 0
+                yield (scorer.position - window, scorer.position,
+                       scorer.decision(), scorer.scores())
+
+
+def read_chunks(path, chunk_size=Markov.CHUNK_SIZE):
+    '''
+    Read a text file chunk by chunk
+
+    Input:  path(str): the file to read
+            chunk_size(int): number of characters per chunk
+
+    Output: generator of str
+    '''
+
+    with open(path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            yield chunk
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Attribute every window of a long transcript to the "
+                    "most likely speaker")
+    parser.add_argument("transcript", help="file name of the transcript")
+    parser.add_argument("order", type=int)
+    parser.add_argument("--window", type=int, default=2000,
+                        help="characters per window (default: 2000)")
+    parser.add_argument("--step", type=int,
+                        help="characters between windows (default: the "
+                             "window size)")
+    parser.add_argument("--speakers", nargs="+",
+                        help="training speech of every candidate (default: "
+                             "the bundled speeches)")
+    parser.add_argument("--model-dir",
+                        help="directory where trained speaker models are "
+                             "saved and reused by later runs")
+    args = parser.parse_args()
+
+    if args.speakers:
+        import batch_identify
+        speaker_models = {
+            batch_identify.speaker_label(path):
+                Markov.load_or_train(path, args.order, "hash", args.model_dir)
+            for path in args.speakers}
+    else:
+        speaker_models = Markov.speech_models(args.order, "hash",
+                                              args.model_dir)
+    for model in speaker_models.values():
+        model.compile()
+
+    for start, end, name, window_scores in timeline(
+            speaker_models, read_chunks(args.transcript), args.window,
+            args.step):
+        print("{:>9} {:>9}  {:<10} {:.4f}".format(start, end, name,
+                                                   window_scores[name]))
@@ -0,0 +1,190 @@
+# CS122 W'20: Markov models and hash tables
+# Word-level Markov model over interned token ids
+
+import re
+import math
+import Hash_Table
+
+HASH_CELLS = 57
+TOKEN = re.compile(r"\S+")
+
+# Token ids are packed ID_BITS bits apiece into one integer per token
+# sequence. Id 1 stands for any word missing from the vocabulary, so real
+# ids start at 2; as no id is 0, a packed k+1 token never equals a packed
+# k token.
+ID_BITS = 24
+UNKNOWN_ID = 1
+FIRST_ID = 2
+
+
+class Vocabulary:
+    '''
+    Interns words into small integer ids. A vocabulary can be shared by
+    several models, so that each distinct word is stored only once.
+    '''
+
+    def __init__(self):
+        self.ids = {}
+
+    def intern(self, word):
+        '''
+        Return the id of a word, assigning the next free id to new words
+
+        Input: word(str): the word to intern
+
+        Output: (int): its id
+        '''
+
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = len(self.ids) + FIRST_ID
+            if word_id >= 1 << ID_BITS:
+                raise ValueError("the vocabulary is full")
+            self.ids[word] = word_id
+
+        return word_id
+
+    def lookup(self, word):
+        '''
+        Return the id of a word without interning it
+
+        Input: word(str): the word to look up
+
+        Output: (int): its id, or UNKNOWN_ID if it was never interned
+        '''
+
+        return self.ids.get(word, UNKNOWN_ID)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# Vocabulary used by every Word_Markov that is not given its own
+SHARED_VOCABULARY = Vocabulary()
+
+
+def words(s):
+    '''
+    Iterate over the whitespace-separated words of a string, without
+    building a list of them
+
+    Input: s(str): the text to split
+
+    Output: generator of str
+    '''
+
+    for match in TOKEN.finditer(s):
+        yield match.group(0)
+
+
+def packed_grams(ids, k):
+    '''
+    Slide a window of k+1 words over a stream of word ids and yield, for
+    every position, the packed k token preceding it and the packed k+1
+    token ending on it. As in the character model, the text is circular:
+    the first k positions take their context from the last k words, so
+    they are yielded once the stream is exhausted. A text of fewer than k
+    words repeats cyclically to fill the context of its first words.
+
+    Input:  ids(iterable): the word ids of the text
+            k(int): the order of the model
+
+    Output: generator of (packed_k, packed_full) tuples
+    '''
+
+    k_mask = (1 << (ID_BITS * k)) - 1
+    head = []
+    packed_k = 0
+
+    for word_id in ids:
+        if len(head) < k:
+            head.append(word_id)
+            packed_k = (packed_k << ID_BITS) | word_id
+            continue
+        packed_full = (packed_k << ID_BITS) | word_id
+        yield packed_k, packed_full
+        packed_k = packed_full & k_mask
+
+    # packed_k now holds the last k words of the text, unless it has fewer
+    # than k words: the text is then repeated as its own context, so that
+    # a short text is still scored rather than yielding nothing
+    if not head:
+        return
+    if len(head) < k:
+        packed_k = 0
+        for j in range(-k, 0):
+            packed_k = (packed_k << ID_BITS) | head[j % len(head)]
+    for word_id in head:
+        packed_full = (packed_k << ID_BITS) | word_id
+        yield packed_k, packed_full
+        packed_k = packed_full & k_mask
+
+
+class Word_Markov:
+    '''
+    k-order Markov model over the words of a text rather than its
+    characters, with the same get_counts/log_probability interface as
+    Markov. Words are interned into integer ids and each token is keyed by
+    its ids packed into one integer, so a k token costs about as much
+    memory as in the character model however long its words are.
+    '''
+
+    def __init__(self, k, s, vocabulary=None):
+        '''
+        Construct a new k-order word Markov model using the statistics of
+        string "s"
+
+        Input:  k(int): integer denoting the kth-order of the Markov model
+                s(str): string containing speech of a known candidate
+                vocabulary(Vocabulary): the vocabulary to intern words in
+                                        (default: SHARED_VOCABULARY)
+        '''
+
+        self.mkv_hash = Hash_Table.Compact_Hash_Table(HASH_CELLS, 0)
+        self.vocabulary = (vocabulary if vocabulary is not None
+                           else SHARED_VOCABULARY)
+        self.training_str = s
+        self.order = k
+        self.word_ids = set()
+
+    def get_counts(self):
+        '''
+        Count the k and k+1 tokens of every word position of the training
+        string
+
+        Input: N/A [Inplace Modification of Hash Table]
+        Output: N/A [Inplace Modification of Hash Table]
+        '''
+
+        intern = self.vocabulary.intern
+        ids = (intern(word) for word in words(self.training_str))
+
+        for packed_k, packed_full in packed_grams(ids, self.order):
+            self.mkv_hash.increment(packed_full)
+            self.mkv_hash.increment(packed_k)
+            self.word_ids.add(packed_full & ((1 << ID_BITS) - 1))
+
+        self.mkv_hash.shrink()
+
+    def log_probability(self, s):
+        '''
+        Get the log probability of the words of string "s", streaming over
+        them, with add-one smoothing over the vocabulary of the training
+        text. This probability is *not* normalized by the length of s.
+
+        Input: s(str): string containing a speech from an unknown source
+
+        Output: agg_log_prob(float): the aggregate log probability
+        '''
+
+        lookup = self.vocabulary.lookup
+        S_val = len(self.word_ids)
+        agg_log_prob = 0
+
+        for packed_k, packed_full in packed_grams(
+                (lookup(word) for word in words(s)), self.order):
+            N_val = self.mkv_hash.lookup(packed_k)
+            M_val = self.mkv_hash.lookup(packed_full)
+            agg_log_prob += math.log((M_val + 1) / (N_val + S_val))
+
+        return agg_log_prob
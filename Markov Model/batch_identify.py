@@ -0,0 +1,264 @@
+# CS122 W'20: Markov models and hash tables
+# Batch speaker attribution over a directory of speech fragments
+
+import os
+import re
+import csv
+import sys
+import time
+import argparse
+import concurrent.futures
+import Markov
+
+FRAGMENT_NAME = re.compile(r"^([A-Za-z]+)-(\d+)\.txt$")
+CSV_FIELDS = ["file", "true_speaker", "likelihood_a", "likelihood_b",
+              "decision", "correct"]
+
+# Models of the worker processes, set once by init_worker
+worker_models = None
+
+
+def speaker_label(path):
+    '''
+    Name of the speaker of a speech file, taken from the letters at the
+    start of its file name, e.g. "bush" for both "bush1+2.txt" and
+    "BUSH-12.txt"
+
+    Input: path(str): the speech file
+
+    Output: (str): the lower-case speaker name
+    '''
+
+    return re.match(r"[A-Za-z]*", os.path.basename(path)).group(0).lower()
+
+
+def list_fragments(directory):
+    '''
+    List the numbered fragments (NAME-<n>.txt) of a directory, sorted by
+    speaker and number; whole-debate files such as BUSH.txt are skipped
+
+    Input: directory(str): the directory to scan
+
+    Output: (list): paths of the fragment files
+    '''
+
+    fragments = []
+    for name in os.listdir(directory):
+        match = FRAGMENT_NAME.match(name)
+        if match:
+            fragments.append((match.group(1), int(match.group(2)), name))
+    fragments.sort()
+
+    return [os.path.join(directory, name) for _, _, name in fragments]
+
+
+def init_worker(models):
+    '''
+    Store the trained speaker models in a worker process, so that they are
+    transferred once per process rather than once per fragment
+
+    Input: models(tuple): the models of speakers A and B
+    '''
+
+    global worker_models
+    worker_models = models
+
+
+def score_file(path):
+    '''
+    Attribute one fragment to speaker A or B with the models of the worker
+
+    Input: path(str): the fragment file
+
+    Output: (path, length, res_tuple)(tuple): the file, its number of
+            characters and the result of Markov.compare_speakers
+    '''
+
+    with open(path) as f:
+        speech = f.read()
+
+    model_a, model_b = worker_models
+    return path, len(speech), Markov.compare_speakers(model_a, model_b,
+                                                      speech)
+
+
+def sweep_file(path):
+    '''
+    Attribute one fragment at every order of the worker's multi-order
+    models
+
+    Input: path(str): the fragment file
+
+    Output: (path, conclusions)(tuple): the file and the conclusion of
+            Markov.compare_speakers ("A", "B" or "A or B") for each order
+    '''
+
+    with open(path) as f:
+        speech = f.read()
+
+    model_a, model_b = worker_models
+    conclusions = []
+    for order in range(model_a.max_order + 1):
+        res_tuple = Markov.compare_speakers(model_a.at_order(order),
+                                            model_b.at_order(order), speech)
+        conclusions.append(res_tuple[2])
+
+    return path, conclusions
+
+
+def sweep_directory(path_a, path_b, directory, max_order, processes=None):
+    '''
+    Accuracy of every order from 0 to max_order on the fragments of a
+    directory, training each speaker once with Multi_Order_Markov instead
+    of once per order
+
+    Input:  path_a(str), path_b(str): training speeches of A and B
+            directory(str): directory of fragments to attribute
+            max_order(int): the highest order to evaluate
+            processes(int): number of worker processes
+
+    Output: accuracies(list): the accuracy of each order 0..max_order
+    '''
+
+    labels = {"A": speaker_label(path_a), "B": speaker_label(path_b)}
+    models = []
+    for path in (path_a, path_b):
+        with open(path) as f:
+            model = Markov.Multi_Order_Markov(max_order, f.read())
+        model.get_counts()
+        models.append(model)
+
+    fragments = list_fragments(directory)
+    correct = [0] * (max_order + 1)
+    with concurrent.futures.ProcessPoolExecutor(
+            processes, initializer=init_worker,
+            initargs=(tuple(models),)) as executor:
+        for path, conclusions in executor.map(sweep_file, fragments):
+            truth = speaker_label(path)
+            for order, conclusion in enumerate(conclusions):
+                correct[order] += labels.get(conclusion) == truth
+
+    return [count / len(fragments) if fragments else 0.0
+            for count in correct]
+
+
+def identify_directory(path_a, path_b, directory, order, backend="hash",
+                       processes=None):
+    '''
+    Train the models of speakers A and B once, then score every fragment of
+    a directory in parallel and compare each decision with the speaker
+    named by the fragment's file name
+
+    Input:  path_a(str), path_b(str): training speeches of A and B
+            directory(str): directory of fragments to attribute
+            order(int): indicates the kth-order Markov model
+            backend(str): one of Markov.BACKENDS
+            processes(int): number of worker processes (default: one per
+                            core)
+
+    Output: (rows, summary)(tuple): one dict per fragment with the
+            CSV_FIELDS, and a dict of accuracy and throughput figures
+    '''
+
+    labels = {"A": speaker_label(path_a), "B": speaker_label(path_b)}
+    start = time.perf_counter()
+    models = (Markov.load_or_train(path_a, order, backend),
+              Markov.load_or_train(path_b, order, backend))
+    train_time = time.perf_counter() - start
+
+    fragments = list_fragments(directory)
+    rows = []
+    total_chars = 0
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+            processes, initializer=init_worker,
+            initargs=(models,)) as executor:
+        for path, length, res_tuple in executor.map(score_file, fragments):
+            likelihood_a, likelihood_b, conclusion = res_tuple
+            decision = labels.get(conclusion, "tie")
+            truth = speaker_label(path)
+            total_chars += length
+            rows.append({"file": os.path.basename(path),
+                         "true_speaker": truth,
+                         "likelihood_a": likelihood_a,
+                         "likelihood_b": likelihood_b,
+                         "decision": decision,
+                         "correct": int(decision == truth)})
+    score_time = time.perf_counter() - start
+
+    correct = sum(row["correct"] for row in rows)
+    summary = {"files": len(rows),
+               "correct": correct,
+               "accuracy": correct / len(rows) if rows else 0.0,
+               "train_seconds": train_time,
+               "score_seconds": score_time,
+               "files_per_sec": len(rows) / score_time if score_time else 0.0,
+               "chars_per_sec": total_chars / score_time if score_time
+                                else 0.0}
+
+    return rows, summary
+
+
+def write_csv(rows, f):
+    '''
+    Write the per-fragment results of identify_directory as CSV
+
+    Input:  rows(list): the rows returned by identify_directory
+            f(file): an open text file
+    '''
+
+    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def print_summary(summary, f):
+    '''
+    Print the accuracy and throughput summary of identify_directory
+    '''
+
+    print("Files: {files}  Correct: {correct}  Accuracy: {accuracy:.3f}"
+          .format(**summary), file=f)
+    print("Training: {train_seconds:.2f}s  Scoring: {score_seconds:.2f}s  "
+          "({files_per_sec:.1f} files/s, {chars_per_sec:.0f} chars/s)"
+          .format(**summary), file=f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Attribute every numbered fragment of a directory to "
+                    "one of two speakers")
+    parser.add_argument("speaker_a", help="file name for speaker A")
+    parser.add_argument("speaker_b", help="file name for speaker B")
+    parser.add_argument("directory", help="directory of NAME-<n>.txt files")
+    parser.add_argument("order", type=int)
+    parser.add_argument("--backend", choices=Markov.BACKENDS, default="hash")
+    parser.add_argument("--processes", type=int,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--output",
+                        help="CSV file for per-fragment results "
+                             "(default: standard output)")
+    parser.add_argument("--sweep", action="store_true",
+                        help="report the accuracy of every order from 0 to "
+                             "<order> instead, training once")
+    args = parser.parse_args()
+
+    if args.sweep:
+        accuracies = sweep_directory(args.speaker_a, args.speaker_b,
+                                     args.directory, args.order,
+                                     args.processes)
+        for order, accuracy in enumerate(accuracies):
+            print("Order {}: accuracy {:.3f}".format(order, accuracy))
+        sys.exit(0)
+
+    rows, summary = identify_directory(args.speaker_a, args.speaker_b,
+                                       args.directory, args.order,
+                                       args.backend, args.processes)
+
+    if args.output is None:
+        write_csv(rows, sys.stdout)
+        print_summary(summary, sys.stderr)
+    else:
+        with open(args.output, "w", newline="") as f:
+            write_csv(rows, f)
+        print_summary(summary, sys.stdout)
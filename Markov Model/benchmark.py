@@ -0,0 +1,325 @@
+# CS122 W'20: Markov models and hash tables
+# Benchmarks for the hash table implementations used by Markov.py, and a
+# suite timing Markov training and scoring whose results are saved as JSON
+# so that two versions can be compared
+
+import os
+import json
+import glob
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+import Hash_Table
+import Markov
+
+SPEECH_FILE = os.path.join(Markov.SPEECH_DIR, "bush1+2.txt")
+GROWTH_SIZES = [10000, 20000, 40000, 80000, 160000]
+GROWTH_ORDER = 6
+TABLE_CLASSES = [Hash_Table.Hash_Table, Hash_Table.Compact_Hash_Table]
+
+SUITE_ORDERS = list(range(1, 11))
+SUITE_SYNTHETIC_SIZES = [1000000]
+SUITE_SPEECHES = os.path.join(Markov.SPEECH_DIR, "*1+2.txt")
+SUITE_UNKNOWN = os.path.join(Markov.SPEECH_DIR, "bush-kerry3", "*-*.txt")
+SUITE_OUTPUT = "benchmark_results.json"
+
+
+def suite_files(pattern):
+    '''
+    List the files of the suite matching a glob pattern
+
+    Input: pattern(str): the glob pattern
+
+    Output: (list): the matching paths, sorted
+    '''
+
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError("no file matches " + pattern)
+
+    return paths
+
+
+def distinct_grams(text, k):
+    '''
+    Collect the distinct k-character substrings of "text", in order of
+    first appearance, to be used as benchmark keys
+
+    Input:  text(str): the text to cut into grams
+            k(int): length of every gram
+
+    Output: grams(list): list of distinct strings of length k
+    '''
+
+    seen = set()
+    grams = []
+    for i in range(len(text) - k + 1):
+        gram = text[i:i + k]
+        if gram not in seen:
+            seen.add(gram)
+            grams.append(gram)
+
+    return grams
+
+
+def bench_table(table_class, keys):
+    '''
+    Insert every key of "keys" into a fresh table of class "table_class",
+    measuring the elapsed time and the memory held by the table itself (the
+    key strings are created beforehand and are not counted)
+
+    Input:  table_class(class): Hash_Table or Compact_Hash_Table
+            keys(list): distinct string keys
+
+    Output: (bytes_per_entry, inserts_per_sec)(tuple of floats)
+    '''
+
+    start = time.perf_counter()
+    table = table_class(57, 0)
+    for key in keys:
+        table.update(key, 1)
+    elapsed = time.perf_counter() - start
+
+    # Measured in a second pass since tracing slows every allocation down
+    tracemalloc.start()
+    table = table_class(57, 0)
+    for key in keys:
+        table.update(key, 1)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return used / len(keys), len(keys) / elapsed
+
+
+def synthetic_text(alphabet, length, seed=0):
+    '''
+    Generate "length" random characters drawn from "alphabet", so that the
+    number of distinct grams keeps growing with the size of the corpus
+
+    Input:  alphabet(str): the characters to draw from
+            length(int): the number of characters to generate
+            seed(int): seed of the random generator
+
+    Output: (str): the synthetic text
+    '''
+
+    rand = random.Random(seed)
+    return "".join(rand.choice(alphabet) for _ in range(length))
+
+
+def bench_growth(alphabet, k, sizes):
+    '''
+    Regression benchmark for the growth policy: insert the distinct grams
+    of synthetic corpora of increasing sizes and print the average time per
+    insert, which should stay flat as the corpus grows. Compact_Hash_Table
+    is timed both growing from the default size and pre-sized.
+
+    Input:  alphabet(str): the characters of the synthetic corpora
+            k(int): length of every gram
+            sizes(list): corpus sizes in characters
+    '''
+
+    builders = [
+        ("Hash_Table", lambda n: Hash_Table.Hash_Table(57, 0)),
+        ("Compact_Hash_Table",
+         lambda n: Hash_Table.Compact_Hash_Table(57, 0)),
+        ("Compact (presized)",
+         lambda n: Hash_Table.Compact_Hash_Table.with_capacity(n, 0))]
+
+    print("{:<20} {:>9} {:>9} {:>12}".format(
+        "table", "chars", "entries", "ns/insert"))
+    for size in sizes:
+        keys = distinct_grams(synthetic_text(alphabet, size), k)
+        for name, build in builders:
+            start = time.perf_counter()
+            table = build(len(keys))
+            for key in keys:
+                table.update(key, 1)
+            elapsed = time.perf_counter() - start
+            print("{:<20} {:>9} {:>9} {:>12.0f}".format(
+                name, size, len(keys), elapsed * 1e9 / len(keys)))
+
+
+def synthetic_speech(words, length, seed=0):
+    '''
+    Generate about "length" characters of text by drawing words at random
+    from a corpus with their corpus frequencies, to get corpora larger than
+    the bundled speeches with a realistic alphabet and word structure
+
+    Input:  words(list): the words of the corpus, with repetitions
+            length(int): the number of characters to generate
+            seed(int): seed of the random generator
+
+    Output: (str): the synthetic text
+    '''
+
+    rand = random.Random(seed)
+    chunks = []
+    total = 0
+    while total < length:
+        chunk = " ".join(rand.choices(words, k=1000)) + "\n"
+        chunks.append(chunk)
+        total += len(chunk)
+
+    return "".join(chunks)[:length]
+
+
+def suite_corpora(sizes):
+    '''
+    Build the corpora of the benchmark suite: one speech, all the bundled
+    speeches, and synthetic text of each of the given sizes
+
+    Input: sizes(list): sizes in characters of the synthetic corpora
+
+    Output: (list): (name, text) tuples
+    '''
+
+    speeches = []
+    for path in suite_files(SUITE_SPEECHES):
+        with open(path) as f:
+            speeches.append(f.read())
+    all_speeches = "".join(speeches)
+
+    corpora = [("bush1+2", speeches[0]),
+               ("speeches", all_speeches)]
+    words = all_speeches.split()
+    for size in sizes:
+        corpora.append(("synthetic-" + str(size),
+                        synthetic_speech(words, size)))
+
+    return corpora
+
+
+def bench_markov(text, order, unknown):
+    '''
+    Train a Markov model on "text" and score "unknown" with it
+
+    Input:  text(str): the training corpus
+            order(int): the order of the model
+            unknown(str): the text to score
+
+    Output: (dict): training time, scoring throughput, peak memory of
+            training, number of times the table grew and was shrunk (the
+            table is sized for the text up front, so it rarely grows, and
+            is shrunk once at the end of training), average probe length
+            and number of entries of the trained table
+    '''
+
+    start = time.perf_counter()
+    model = Markov.Markov(order, text)
+    model.get_counts()
+    train_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.log_probability(unknown)
+    score_time = time.perf_counter() - start
+
+    table = model.mkv_hash
+    result = {"train_seconds": train_time,
+              "score_chars_per_sec": len(unknown) / score_time,
+              "grows": table.resizes - table.shrinks,
+              "shrinks": table.shrinks,
+              "avg_probe_length": table.average_probe_length(),
+              "entries": len(table)}
+    del model, table
+
+    # Measured in a second pass since tracing slows every allocation down
+    tracemalloc.start()
+    model = Markov.Markov(order, text)
+    model.get_counts()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["peak_memory_bytes"] = peak
+
+    return result
+
+
+def run_suite(orders, sizes, output):
+    '''
+    Run bench_markov for every corpus of suite_corpora and every order,
+    print the results and save them to a JSON file
+
+    Input:  orders(list): the orders to benchmark
+            sizes(list): sizes of the synthetic corpora
+            output(str): path of the JSON file to write
+    '''
+
+    unknown_parts = []
+    for path in suite_files(SUITE_UNKNOWN):
+        with open(path) as f:
+            unknown_parts.append(f.read())
+    unknown = "".join(unknown_parts)
+
+    print("{:<18} {:>8} {:>6} {:>9} {:>12} {:>10} {:>6} {:>7} {:>7}".format(
+        "corpus", "chars", "order", "train s", "score c/s", "peak MB",
+        "grows", "shrinks", "probe"))
+    results = []
+    for name, text in suite_corpora(sizes):
+        for order in orders:
+            result = bench_markov(text, order, unknown)
+            result.update({"corpus": name, "chars": len(text),
+                           "order": order})
+            results.append(result)
+            print("{:<18} {:>8} {:>6} {:>9.3f} {:>12.0f} {:>10.1f} {:>6} "
+                  "{:>7} {:>7.2f}".format(name, len(text), order,
+                                          result["train_seconds"],
+                                          result["score_chars_per_sec"],
+                                          result["peak_memory_bytes"] /
+                                          2 ** 20,
+                                          result["grows"],
+                                          result["shrinks"],
+                                          result["avg_probe_length"]))
+
+    with open(output, "w") as f:
+        json.dump({"python": platform.python_version(),
+                   "machine": platform.machine(),
+                   "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "unknown_chars": len(unknown),
+                   "results": results}, f, indent=2)
+
+
+def run(text, orders):
+    '''
+    Print memory per entry and insert throughput of every table class for
+    the distinct grams of each order in "orders"
+    '''
+
+    print("{:<20} {:>6} {:>9} {:>12} {:>14}".format(
+        "table", "order", "entries", "bytes/entry", "inserts/sec"))
+    for k in orders:
+        keys = distinct_grams(text, k)
+        for table_class in TABLE_CLASSES:
+            per_entry, rate = bench_table(table_class, keys)
+            print("{:<20} {:>6} {:>9} {:>12.1f} {:>14.0f}".format(
+                table_class.__name__, k, len(keys), per_entry, rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hash tables, or with --suite the "
+                    "training and scoring of Markov models")
+    parser.add_argument("text_file", nargs="?", default=SPEECH_FILE,
+                        help="text for the hash table benchmarks")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the Markov benchmark suite")
+    parser.add_argument("--orders", type=int, nargs="+",
+                        default=SUITE_ORDERS)
+    parser.add_argument("--sizes", type=int, nargs="*",
+                        default=SUITE_SYNTHETIC_SIZES,
+                        help="sizes of the synthetic corpora")
+    parser.add_argument("--output", default=SUITE_OUTPUT,
+                        help="JSON file for the suite results")
+    args = parser.parse_args()
+
+    if args.suite:
+        run_suite(args.orders, args.sizes, args.output)
+    else:
+        with open(args.text_file) as f:
+            training_text = f.read()
+
+        run(training_text, [2, 4, 6])
+        print("")
+        bench_growth("".join(sorted(set(training_text))), GROWTH_ORDER,
+                     GROWTH_SIZES)
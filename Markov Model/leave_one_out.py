@@ -0,0 +1,165 @@
+# CS122 W'20: Markov models and hash tables
+# Leave-one-out evaluation over the numbered fragments of a directory
+
+import os
+import glob
+import time
+import argparse
+from collections import Counter
+import batch_identify
+import Hash_Table
+import Markov
+
+FOLD_DIRS = os.path.join(Markov.SPEECH_DIR, "*3")
+FOLD_ORDERS = list(range(1, 9))
+
+
+def fragment_counts(text, k):
+    '''
+    Count the k and k+1 tokens of one fragment, wrapped around on itself
+    as if it had been trained on alone
+
+    Input:  text(str): the fragment
+            k(int): the order of the model
+
+    Output: (Compact_Hash_Table): the counts of the fragment
+    '''
+
+    table = Hash_Table.Compact_Hash_Table.with_capacity(2 * len(text), 0)
+    Markov.count_tokens(table, Markov.wrap_around(text, k), k)
+    table.shrink()
+
+    return table
+
+
+class Speaker_Folds:
+    '''
+    Model of one speaker trained once on all of their fragments (the sum of
+    the counts of a model of each fragment), from which any one fragment
+    can be held out by subtracting its counts, and restored afterwards.
+    Holding a fragment out gives exactly the model that retraining on the
+    other fragments would.
+    '''
+
+    def __init__(self, k, texts):
+        '''
+        Input:  k(int): the order of the model
+                texts(list): the fragments of the speaker
+        '''
+
+        self.texts = texts
+        self.fragments = [fragment_counts(text, k) for text in texts]
+        self.model = Markov.Markov(k, "")
+        self.model.finished = True
+        self.char_counts = Counter()
+        for text, counts in zip(texts, self.fragments):
+            self.model.mkv_hash.merge(counts)
+            self.char_counts.update(text)
+        self.model.chars = set(self.char_counts)
+
+    def hold_out(self, idx):
+        '''
+        Remove fragment "idx" from the model, including the characters that
+        no other fragment uses from its alphabet
+
+        Input: idx(int): index of the fragment in texts
+        '''
+
+        self.model.mkv_hash.subtract(self.fragments[idx])
+        self.char_counts.subtract(self.texts[idx])
+        for letter in set(self.texts[idx]):
+            if self.char_counts[letter] == 0:
+                self.model.chars.discard(letter)
+
+    def restore(self, idx):
+        '''
+        Add fragment "idx" back after hold_out
+
+        Input: idx(int): index of the fragment in texts
+        '''
+
+        self.model.mkv_hash.merge(self.fragments[idx])
+        self.char_counts.update(self.texts[idx])
+        self.model.chars.update(self.texts[idx])
+
+
+def read_fragments(directory):
+    '''
+    Read the numbered fragments of a directory, grouped by speaker
+
+    Input: directory(str): a directory of NAME-<n>.txt files
+
+    Output: (dict): maps each speaker label to the list of their fragments
+    '''
+
+    fragments = {}
+    for path in batch_identify.list_fragments(directory):
+        with open(path) as f:
+            fragments.setdefault(batch_identify.speaker_label(path),
+                                 []).append(f.read())
+
+    return fragments
+
+
+def leave_one_out(fragments, order):
+    '''
+    Attribute every fragment of a pair of speakers with models trained on
+    all the other fragments
+
+    Input:  fragments(dict): the fragments of exactly two speakers, as
+                             returned by read_fragments
+            order(int): the order of the models
+
+    Output: (correct, total)(tuple of ints)
+    '''
+
+    if len(fragments) != 2:
+        raise ValueError("leave-one-out needs the fragments of exactly two "
+                         "speakers")
+    names = sorted(fragments)
+    folds = [Speaker_Folds(order, fragments[name]) for name in names]
+    model_a, model_b = folds[0].model, folds[1].model
+
+    correct = 0
+    total = 0
+    for speaker, speaker_folds in enumerate(folds):
+        for idx, text in enumerate(speaker_folds.texts):
+            speaker_folds.hold_out(idx)
+            conclusion = Markov.compare_speakers(model_a, model_b, text)[2]
+            speaker_folds.restore(idx)
+            correct += conclusion == "AB"[speaker]
+            total += 1
+
+    return correct, total
+
+
+def report(orders):
+    '''
+    Print the leave-one-out accuracy of every order for every directory of
+    fragments of the bundled speeches
+
+    Input: orders(list): the orders to evaluate
+    '''
+
+    print("{:<16} {:>5} {:>6} {:>9} {:>9}".format(
+        "pair", "order", "folds", "accuracy", "seconds"))
+    for directory in sorted(glob.glob(FOLD_DIRS)):
+        fragments = read_fragments(directory)
+        for order in orders:
+            start = time.perf_counter()
+            correct, total = leave_one_out(fragments, order)
+            elapsed = time.perf_counter() - start
+            print("{:<16} {:>5} {:>6} {:>9.3f} {:>9.2f}".format(
+                os.path.basename(directory), order, total,
+                correct / total if total else 0.0, elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Leave-one-out accuracy of every order on the numbered "
+                    "fragments of the bundled speeches")
+    parser.add_argument("--orders", type=int, nargs="+",
+                        default=FOLD_ORDERS)
+    args = parser.parse_args()
+
+    report(args.orders)
@@ -0,0 +1,321 @@
+# CS122 W'20: Markov models and hash tables
+# Long-running HTTP server scoring texts against speaker models kept in
+# memory
+#
+#   POST /score   body: {"text": "...", "top_n": 3} (or the plain text)
+#                 returns the speakers ranked by Markov.identify_among
+#   GET  /stats   returns throughput and latency figures
+
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import Markov
+
+MAX_BATCH = 32
+MAX_WAIT = 0.005
+LATENCY_WINDOW = 1000
+
+
+class Scoring_Service:
+    '''
+    Scores texts against a fixed set of speaker models. Requests from any
+    number of threads are queued, and a single worker thread takes them
+    off the queue in batches: when a request arrives with others already
+    queued, it waits up to max_wait seconds for more (a lone request is
+    not held back), then scores the batch and hands every result back.
+    Each distinct text is still scored on its own by Markov.identify_among;
+    batching only saves scoring identical texts more than once, and the
+    queue handoffs of the requests.
+    '''
+
+    def __init__(self, models, order, max_batch=MAX_BATCH,
+                 max_wait=MAX_WAIT):
+        '''
+        Input:  models(dict): maps each speaker name to a trained model
+                order(int): the order of the models
+                max_batch(int): the most requests scored in one pass
+                max_wait(float): seconds to wait for a batch to fill up
+        '''
+
+        self.models = models
+        self.order = order
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.scored = 0
+        self.batches = 0
+        self.chars = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        '''
+        Start the worker thread
+        '''
+
+        self.worker.start()
+
+    def submit(self, text, top_n=None):
+        '''
+        Queue a text for scoring
+
+        Input:  text(str): contains a speech from unknown source
+                top_n(int): number of speakers to return (default: all)
+
+        Output: (Future): resolves to the ranking of Markov.identify_among
+        '''
+
+        future = Future()
+        self.requests.put((text, top_n, future, time.perf_counter()))
+        return future
+
+    def next_batch(self):
+        '''
+        Block until a request arrives, then, if more are already queued,
+        collect the requests arriving within max_wait seconds, up to
+        max_batch of them. A request alone in the queue is scored at once
+        rather than waiting for others.
+
+        Output: batch(list): (text, top_n, future, arrival) tuples
+        '''
+
+        batch = [self.requests.get()]
+        if self.requests.empty():
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def run(self):
+        '''
+        Score batches of requests forever
+        '''
+
+        while True:
+            batch = self.next_batch()
+            start = time.perf_counter()
+            rankings = {}
+            for text, _, future, _ in batch:
+                if text in rankings:
+                    continue
+                try:
+                    rankings[text] = Markov.identify_among(
+                        self.models, text, self.order)
+                except Exception as error:
+                    rankings[text] = error
+
+            finish = time.perf_counter()
+            for text, top_n, future, arrival in batch:
+                # Nothing raised by one request may stop the worker thread
+                try:
+                    ranking = rankings[text]
+                    if isinstance(ranking, Exception):
+                        raise ranking
+                    future.set_result(ranking[:top_n])
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+
+            with self.lock:
+                self.batches += 1
+                self.scored += len(batch)
+                self.chars += sum(len(text) for text in rankings)
+                self.busy_seconds += finish - start
+                self.latencies.extend(finish - arrival
+                                      for _, _, _, arrival in batch)
+
+    def stats(self):
+        '''
+        Throughput and latency figures since the service started; latency
+        percentiles cover the last LATENCY_WINDOW requests
+
+        Output: (dict): the figures, ready to be encoded as JSON
+        '''
+
+        with self.lock:
+            uptime = time.perf_counter() - self.started
+            latencies = sorted(self.latencies)
+            figures = {"uptime_seconds": uptime,
+                       "requests": self.scored,
+                       "batches": self.batches,
+                       "avg_batch_size": (self.scored / self.batches
+                                          if self.batches else 0.0),
+                       "queued": self.requests.qsize(),
+                       "requests_per_sec": self.scored / uptime,
+                       "chars_per_busy_sec": (self.chars / self.busy_seconds
+                                              if self.busy_seconds else 0.0),
+                       "speakers": sorted(self.models),
+                       "order": self.order}
+
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            figures["latency_" + name + "_ms"] = (
+                latencies[min(int(fraction * len(latencies)),
+                              len(latencies) - 1)] * 1000
+                if latencies else 0.0)
+
+        return figures
+
+
+class Score_Handler(BaseHTTPRequestHandler):
+    '''
+    HTTP front end of the Scoring_Service attached to its server
+    '''
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.service.stats())
+        else:
+            self.send_json(404, {"error": "unknown path " + self.path})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self.send_json(404, {"error": "unknown path " + self.path})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError("negative Content-Length")
+            # UnicodeDecodeError is a ValueError
+            body = self.rfile.read(length).decode("utf-8")
+        except ValueError:
+            self.send_json(400, {"error": "expected a UTF-8 body of "
+                                          "Content-Length bytes"})
+            return
+
+        top_n = None
+        if self.headers.get("Content-Type", "").startswith(
+                "application/json"):
+            try:
+                request = json.loads(body)
+                text = request["text"]
+                top_n = request.get("top_n")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.send_json(400, {"error": "expected a JSON object with "
+                                              "a \"text\" field"})
+                return
+        else:
+            text = body
+
+        if not isinstance(text, str):
+            self.send_json(400, {"error": "\"text\" must be a string"})
+            return
+        # An empty text gives every speaker the same score of 0
+        if not text:
+            self.send_json(400, {"error": "\"text\" must not be empty"})
+            return
+        # bool is a subclass of int, but "top_n": true is not a count
+        if top_n is not None and (not isinstance(top_n, int) or
+                                  isinstance(top_n, bool) or top_n < 0):
+            self.send_json(400, {"error": "\"top_n\" must be a "
+                                          "non-negative integer"})
+            return
+
+        try:
+            ranking = self.server.service.submit(text, top_n).result()
+        except Exception as error:
+            self.send_json(400, {"error": str(error)})
+            return
+
+        self.send_json(200, {"best": ranking[0][0] if ranking else None,
+                             "ranking": [{"speaker": name,
+                                          "likelihood": likelihood,
+                                          "posterior": posterior}
+                                         for name, likelihood, posterior
+                                         in ranking]})
+
+    def log_message(self, format, *args):
+        # Requests are accounted for by /stats instead
+        pass
+
+
+def make_server(service, host, port):
+    '''
+    Create the HTTP server of a scoring service (not yet serving)
+
+    Input:  service(Scoring_Service): the service to expose
+            host(str), port(int): the address to listen on
+
+    Output: (ThreadingHTTPServer): the server
+    '''
+
+    server = ThreadingHTTPServer((host, port), Score_Handler)
+    server.daemon_threads = True
+    server.service = service
+
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve speaker attribution over HTTP with the models "
+                    "kept in memory")
+    parser.add_argument("order", type=int)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8122)
+    parser.add_argument("--backend", choices=Markov.BACKENDS, default="hash")
+    parser.add_argument("--speakers", nargs="+",
+                        help="training speech of every candidate (default: "
+                             "the bundled speeches)")
+    parser.add_argument("--model-dir",
+                        help="directory where trained speaker models are "
+                             "saved and reused by later runs")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT,
+                        help="seconds to wait for a batch to fill up "
+                             "when more requests are queued; a request "
+                             "arriving alone is scored without waiting")
+    args = parser.parse_args()
+    if args.model_dir is not None and not Markov.backend_saves(args.backend):
+        parser.error("models of the " + args.backend + " backend cannot be "
+                     "saved to --model-dir")
+
+    if args.speakers:
+        import batch_identify
+        speaker_models = {
+            batch_identify.speaker_label(path):
+                Markov.load_or_train(path, args.order, args.backend,
+                                     args.model_dir)
+            for path in args.speakers}
+    else:
+        speaker_models = Markov.speech_models(args.order, args.backend,
+                                              args.model_dir)
+    for model in speaker_models.values():
+        if hasattr(model, "compile"):
+            model.compile()
+
+    scoring_service = Scoring_Service(speaker_models, args.order,
+                                      args.max_batch, args.max_wait)
+    scoring_service.start()
+    http_server = make_server(scoring_service, args.host, args.port)
+    print("Serving {} speakers on http://{}:{}".format(
+        len(speaker_models), args.host, args.port))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        http_server.server_close()
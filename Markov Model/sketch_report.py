@@ -0,0 +1,147 @@
+# CS122 W'20: Markov models and hash tables
+# Attribution accuracy of Count-Min sketch models against exact counts
+
+import os
+import sys
+import argparse
+import batch_identify
+import Count_Min_Sketch
+import Markov
+
+# Fragment directories of the bundled speeches, with the training
+# speeches of their two speakers
+PAIRS = [("bush-kerry3", "bush1+2.txt", "kerry1+2.txt"),
+         ("obama-mccain3", "obama1+2.txt", "mccain1+2.txt")]
+REPORT_ORDERS = [2, 4, 6, 8]
+REPORT_BUDGETS = [1 << 16, 1 << 18, 1 << 20]
+
+
+def train(path, order, store=None):
+    '''
+    Train a model of one speaker
+
+    Input:  path(str): the training speech
+            order(int): the order of the model
+            store: the count store (default: exact counts)
+
+    Output: (Markov): the trained model
+    '''
+
+    with open(path) as f:
+        model = Markov.Markov(order, f.read(), store)
+    model.get_counts()
+
+    return model
+
+
+def store_bytes(store):
+    '''
+    Memory taken by the count store of a model: the counters of a sketch,
+    or the arrays and key strings of an exact table (small counts are
+    shared int objects and are not included)
+
+    Input: store(Compact_Hash_Table or Count_Min_Sketch): the counts
+
+    Output: (int): size in bytes
+    '''
+
+    if isinstance(store, Count_Min_Sketch.Count_Min_Sketch):
+        return store.memory_bytes()
+
+    return (sys.getsizeof(store.keys) + sys.getsizeof(store.vals) +
+            sys.getsizeof(store.hashes) +
+            sum(sys.getsizeof(key) for key, _ in store.items()))
+
+
+def decisions(model_a, model_b, fragments):
+    '''
+    Attribute every fragment with a pair of models
+
+    Input:  model_a, model_b: the models of speakers A and B
+            fragments(list): (speech, true label) tuples
+
+    Output: (list): "A", "B" or "A or B" for each fragment
+    '''
+
+    return [Markov.compare_speakers(model_a, model_b, speech)[2]
+            for speech, _ in fragments]
+
+
+def accuracy(conclusions, labels, fragments):
+    '''
+    Output: (float): the fraction of fragments attributed to their speaker
+    '''
+
+    correct = sum(labels.get(conclusion) == truth for conclusion, (_, truth)
+                  in zip(conclusions, fragments))
+    return correct / len(fragments) if fragments else 0.0
+
+
+def report(orders, budgets, depth):
+    '''
+    For every speaker pair and order, print the accuracy and memory of
+    exact models, and of sketch models under every memory budget along
+    with how often they agree with the exact models
+
+    Input:  orders(list): the orders to evaluate
+            budgets(list): memory budgets of each sketch, in bytes
+            depth(int): number of rows of each sketch
+    '''
+
+    print("{:<14} {:>5} {:>10} {:>10} {:>9} {:>9}".format(
+        "pair", "order", "store", "memory KB", "accuracy", "agreement"))
+    for directory, speech_a, speech_b in PAIRS:
+        path_a = os.path.join(Markov.SPEECH_DIR, speech_a)
+        path_b = os.path.join(Markov.SPEECH_DIR, speech_b)
+        labels = {"A": batch_identify.speaker_label(path_a),
+                  "B": batch_identify.speaker_label(path_b)}
+        fragments = []
+        for path in batch_identify.list_fragments(
+                os.path.join(Markov.SPEECH_DIR, directory)):
+            with open(path) as f:
+                fragments.append((f.read(),
+                                  batch_identify.speaker_label(path)))
+
+        for order in orders:
+            model_a = train(path_a, order)
+            model_b = train(path_b, order)
+            exact = decisions(model_a, model_b, fragments)
+            memory = (store_bytes(model_a.mkv_hash) +
+                      store_bytes(model_b.mkv_hash))
+            print("{:<14} {:>5} {:>10} {:>10.0f} {:>9.3f} {:>9}".format(
+                directory, order, "exact", memory / 1024,
+                accuracy(exact, labels, fragments), ""))
+
+            for budget in budgets:
+                model_a = train(path_a, order,
+                                Count_Min_Sketch.Count_Min_Sketch
+                                .with_budget(budget, depth))
+                model_b = train(path_b, order,
+                                Count_Min_Sketch.Count_Min_Sketch
+                                .with_budget(budget, depth))
+                approx = decisions(model_a, model_b, fragments)
+                agreement = sum(a == e for a, e in zip(approx, exact))
+                memory = (store_bytes(model_a.mkv_hash) +
+                          store_bytes(model_b.mkv_hash))
+                print("{:<14} {:>5} {:>10} {:>10.0f} {:>9.3f} {:>9.3f}"
+                      .format(directory, order, "cms " + str(budget >> 10) +
+                              "K", memory / 1024,
+                              accuracy(approx, labels, fragments),
+                              agreement / len(fragments) if fragments
+                              else 0.0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the attribution accuracy of Count-Min sketch "
+                    "models with exact models on the bundled fragments")
+    parser.add_argument("--orders", type=int, nargs="+",
+                        default=REPORT_ORDERS)
+    parser.add_argument("--budgets", type=int, nargs="+",
+                        default=REPORT_BUDGETS,
+                        help="memory budget of each sketch, in bytes")
+    parser.add_argument("--depth", type=int,
+                        default=Count_Min_Sketch.DEFAULT_DEPTH)
+    args = parser.parse_args()
+
+    report(args.orders, args.budgets, args.depth)
@@ -0,0 +1,74 @@
+# CS122 W'20: Markov models and hash tables
+# Every way of training a Markov model gives the counts of get_counts, and
+# parallel scoring gives the score of log_probability bit for bit
+
+import os
+import pytest
+import Markov
+
+SPEECH = os.path.join(Markov.SPEECH_DIR, "bush1+2.txt")
+UNKNOWN = os.path.join(Markov.SPEECH_DIR, "bush-kerry3", "BUSH-0.txt")
+ORDERS = [0, 1, 3, 6]
+
+
+@pytest.fixture(scope="module")
+def speech():
+    with open(SPEECH) as f:
+        return f.read()[:30000]
+
+
+@pytest.fixture(scope="module")
+def unknown():
+    with open(UNKNOWN) as f:
+        return f.read()
+
+
+def counts(model):
+    return dict(model.mkv_hash.items())
+
+
+@pytest.mark.parametrize("k", ORDERS)
+def test_streaming_counts(speech, k):
+    expected = counts(Markov.make_model(k, speech))
+    for chunk_size in [1, 7, 1000]:
+        model = Markov.Markov(k, "")
+        for start in range(0, len(speech), chunk_size):
+            model.update(speech[start:start + chunk_size])
+        model.finish()
+        assert counts(model) == expected
+        assert model.chars == set(speech)
+
+
+def test_from_files(speech, tmp_path):
+    paths = []
+    for idx, start in enumerate(range(0, len(speech), 9000)):
+        path = tmp_path / ("part" + str(idx) + ".txt")
+        path.write_text(speech[start:start + 9000])
+        paths.append(str(path))
+    model = Markov.Markov.from_files(4, paths, chunk_size=500)
+    assert counts(model) == counts(Markov.make_model(4, speech))
+
+
+@pytest.mark.parametrize("k", ORDERS)
+def test_sharded_counts(speech, k):
+    model = Markov.Markov(k, speech)
+    model.get_counts_parallel(processes=2, shards=5)
+    assert counts(model) == counts(Markov.make_model(k, speech))
+
+
+@pytest.mark.parametrize("k", ORDERS)
+def test_span_counts(speech, k):
+    model = Markov.Markov(k, speech)
+    model.get_counts_spans()
+    assert counts(model) == counts(Markov.make_model(k, speech))
+
+
+@pytest.mark.parametrize("k", [1, 4])
+def test_parallel_scoring(speech, unknown, k, tmp_path):
+    model = Markov.make_model(k, speech)
+    expected = model.log_probability(unknown)
+    assert model.log_probability_parallel(unknown, 2, 5) == expected
+
+    path = str(tmp_path / "model.mkv")
+    model.save(path)
+    assert model.log_probability_parallel(unknown, 2, 5, path) == expected
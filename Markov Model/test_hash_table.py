@@ -0,0 +1,94 @@
+# CS122 W'20: Markov models and hash tables
+# Compact_Hash_Table checked against a dict under random increments and
+# decrements, including the backward-shift deletion of decrement
+
+import random
+import pytest
+import Hash_Table
+
+
+def check_against(table, expected):
+    assert len(table) == len(expected)
+    assert dict(table.items()) == expected
+    for key, val in expected.items():
+        assert table.lookup(key) == val
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_increments_and_decrements(seed):
+    rand = random.Random(seed)
+    table = Hash_Table.Compact_Hash_Table(8, 0)
+    expected = {}
+    # Few short keys over a small alphabet, so that runs are long and many
+    # keys are deleted and inserted again
+    keys = ["".join(rand.choice("abc") for _ in range(rand.randint(1, 3)))
+            for _ in range(60)]
+
+    for step in range(3000):
+        key = rand.choice(keys)
+        if key in expected and rand.random() < 0.5:
+            delta = rand.randint(1, expected[key])
+            assert table.decrement(key, delta) == expected[key] - delta
+            expected[key] -= delta
+            if expected[key] == 0:
+                del expected[key]
+        else:
+            delta = rand.randint(1, 3)
+            assert table.increment(key, delta) == expected.get(key, 0) + delta
+            expected[key] = expected.get(key, 0) + delta
+        if step % 100 == 0:
+            check_against(table, expected)
+
+    check_against(table, expected)
+    for key in keys:
+        if key not in expected:
+            assert table.lookup(key) == 0
+
+
+def test_deletion_in_colliding_runs():
+    # Every key gets one of two hash values, both with their home in the
+    # last cells of the table, so the runs merge and wrap around its end
+    # and deletions must shift entries across it
+    table = Hash_Table.Compact_Hash_Table(64, 0)
+    mask = 63
+    homes = [next(hash_val for hash_val in range(1 << 20)
+                  if Hash_Table.home(hash_val, mask) == cell)
+             for cell in (mask - 1, mask)]
+    hash_vals = {}
+    expected = {}
+    rand = random.Random(7)
+    for step in range(2000):
+        key = "k" + str(rand.randrange(24))
+        hash_val = hash_vals.setdefault(key, rand.choice(homes))
+        if key in expected and rand.random() < 0.5:
+            table.decrement(key, expected.pop(key), hash_val)
+        else:
+            table.increment(key, 1, hash_val)
+            expected[key] = expected.get(key, 0) + 1
+        for other, val in expected.items():
+            assert table.lookup(other, hash_vals[other]) == val
+    assert len(table) == len(expected)
+    assert len(table.keys) == 64
+
+
+def test_decrement_of_missing_key():
+    table = Hash_Table.Compact_Hash_Table(8, 0)
+    table.increment("a")
+    with pytest.raises(KeyError):
+        table.decrement("b")
+
+
+def test_subtract_undoes_merge():
+    rand = random.Random(3)
+    base = Hash_Table.Compact_Hash_Table(8, 0)
+    other = Hash_Table.Compact_Hash_Table(8, 0)
+    base.count_all(rand.choice("abcdef") * rand.randint(1, 4)
+                   for _ in range(500))
+    other.count_all(rand.choice("abcdefgh") * rand.randint(1, 4)
+                    for _ in range(500))
+    before = dict(base.items())
+
+    base.merge(other)
+    base.subtract(other)
+
+    check_against(base, before)
@@ -0,0 +1,111 @@
+# CS122 W'20: Markov models and hash tables
+# Scores of texts shorter than the order, checked against the formula of
+# the original implementation
+
+import os
+import math
+import pytest
+import Markov
+
+SPEECH = os.path.join(Markov.SPEECH_DIR, "bush1+2.txt")
+SHORT_TEXTS = ["a", "ab", "abc", "The", "xyz!", "wq"]
+
+
+def baseline_keys(s, k):
+    '''
+    The keys the original get_counts and log_probability built for every
+    position of s
+    '''
+
+    length = len(s)
+    for i in range(length):
+        front_cut = i - k
+        if front_cut < 0:
+            full = s[length + front_cut:] + s[:i + 1]
+            partial = s[length + front_cut:] + s[:i]
+        else:
+            full = s[front_cut:i + 1]
+            partial = s[front_cut:i]
+        yield partial, full
+
+
+def baseline_counts(s, k):
+    counts = {}
+    for partial, full in baseline_keys(s, k):
+        counts[full] = counts.get(full, 0) + 1
+        counts[partial] = counts.get(partial, 0) + 1
+    return counts
+
+
+def baseline_log_probability(counts, chars, s, k):
+    total = 0
+    for _, full in baseline_keys(s, k):
+        N_val = counts.get(full[:k], 0)
+        M_val = counts.get(full, 0)
+        total += math.log((M_val + 1) / (N_val + len(chars)))
+    return total
+
+
+@pytest.fixture(scope="module")
+def speech():
+    with open(SPEECH) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("k", [3, 4, 6])
+def test_short_texts_match_baseline(speech, k, tmp_path):
+    counts = baseline_counts(speech, k)
+    model = Markov.make_model(k, speech)
+    path = str(tmp_path / "model.mkv")
+    model.save(path)
+    loaded = Markov.Markov.load(path)
+
+    for text in SHORT_TEXTS:
+        if len(text) >= k:
+            continue
+        expected = baseline_log_probability(counts, set(speech), text, k)
+        assert expected < 0
+        assert model.log_probability(text) == expected
+        assert loaded.log_probability(text) == expected
+
+    model.compile()
+    for text in SHORT_TEXTS:
+        if len(text) < k:
+            expected = baseline_log_probability(counts, set(speech), text, k)
+            assert model.log_probability(text) == expected
+
+
+def test_numpy_short_texts_match_baseline(speech):
+    pytest.importorskip("numpy")
+    k = 4
+    counts = baseline_counts(speech, k)
+    model = Markov.make_model(k, speech, "numpy")
+    for text in SHORT_TEXTS:
+        if len(text) < k:
+            assert model.log_probability(text) == baseline_log_probability(
+                counts, set(speech), text, k)
+
+
+def test_short_training_text_matches_baseline():
+    k = 5
+    training = "abcb"
+    model = Markov.make_model(k, training)
+    counts = baseline_counts(training, k)
+    assert dict(model.mkv_hash.items()) == counts
+    for text in ["ab", "bcab", "abcabcab"]:
+        assert model.log_probability(text) == baseline_log_probability(
+            counts, set(training), text, k)
+
+
+def test_short_texts_rank_like_log_probability(speech):
+    models = {"bush": Markov.make_model(4, speech),
+              "other": Markov.make_model(4, speech[:20000])}
+    ranking = Markov.identify_among(models, "ab", 4)
+    for name, likelihood, _ in ranking:
+        assert likelihood == models[name].log_probability("ab") / 2
+        assert likelihood < 0
+
+
+def test_wrap_around_rejects_short_texts():
+    with pytest.raises(ValueError):
+        Markov.wrap_around("ab", 3)
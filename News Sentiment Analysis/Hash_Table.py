@@ -25,6 +25,7 @@ class Hash_Table:
         self.cells = cells
         self.defval = defval
         self.Hash_Table = [None] * cells
+        self.cnt = 0
 
 
     def create_table(self, key):
@@ -89,47 +90,116 @@ class Hash_Table:
         '''
         Change the value associated with key "key" to value "val".
         If "key" is not currently present in the hash table,  insert it with
-        value "val".
+        value "val". The key is found with a single probe sequence, and the
+        table grows once it is half full, so an update takes constant time
+        on average.
 
         Inputs:
             key (string): the string of the text that we will use
             val (int): the value associated with the specified key
         '''
 
-        key_list = [item[0] for item in self.Hash_Table if item != None]
-
-        if key not in key_list:
-            self.Hash_Table = self.hashing(key, val, self.Hash_Table)
-            if len(key_list) >= TOO_FULL * len(self.Hash_Table):
-                item_list = [item for item in self.Hash_Table if item != None]
-                new_table = [None] * len(self.Hash_Table) * GROWTH_RATIO
-                for item in item_list:
-                    self.Hash_Table = self.hashing(item[0], item[1], new_table)
+        index = self.find_slot(key)
 
+        if self.Hash_Table[index] == None:
+            self.Hash_Table[index] = (key, val)
+            self.cnt += 1
+            if self.cnt >= TOO_FULL * len(self.Hash_Table):
+                self.rehashing()
         else:
-            for item in self.Hash_Table:
-                if item != None:
-                    if item[0] == key:
-                        self.Hash_Table[self.Hash_Table.index(item)] = (key, val)
+            self.Hash_Table[index] = (key, val)
 
 
-    def hashing(self, key, val, table):
+    def find_slot(self, key):
 
         '''
-        Complete the linear probing implementation
+        Linear probe the table for a key, starting from its hash value
 
         Inputs:
             key (string): the string of the text that we will use
-            val (int): the value associated with the specified key
-            table (hash table): a hash table
+
+        Returns:
+            index (int): the index of the cell holding the key, or of the
+            empty cell where the key would be inserted
         '''
 
         index = self.create_table(key)
-        while table[index] != None:
-            if index < len(table) - 1:
+        while self.Hash_Table[index] != None:
+            if self.Hash_Table[index][0] == key:
+                return index
+            if index < len(self.Hash_Table) - 1:
                 index += 1
             else:
                 index = 0
-        table[index] = (key, val)
 
-        return table
\ No newline at end of file
+        return index
+
+
+    def rehashing(self):
+
+        '''
+        Grow the table by GROWTH_RATIO and re-insert every entry into the
+        new table (the hash values depend on the size of the table)
+        '''
+
+        item_list = [item for item in self.Hash_Table if item != None]
+        self.cells = len(self.Hash_Table) * GROWTH_RATIO
+        self.Hash_Table = [None] * self.cells
+        for item in item_list:
+            self.Hash_Table[self.find_slot(item[0])] = item
+
+
+    def increment(self, key, delta=1):
+
+        '''
+        Add delta to the value associated with key "key" (a key that is not
+        present counts as the default value), probing the table only once
+
+        Inputs:
+            key (string): the string of the text that we will use
+            delta (int): the amount to add to the value
+
+        Returns:
+            val (int): the new value associated with the key
+        '''
+
+        index = self.find_slot(key)
+
+        if self.Hash_Table[index] == None:
+            val = self.defval + delta
+            self.Hash_Table[index] = (key, val)
+            self.cnt += 1
+            if self.cnt >= TOO_FULL * len(self.Hash_Table):
+                self.rehashing()
+        else:
+            val = self.Hash_Table[index][1] + delta
+            self.Hash_Table[index] = (key, val)
+
+        return val
+
+
+    def update_many(self, pairs):
+
+        '''
+        Update the table with every (key, val) pair of an iterable
+
+        Inputs:
+            pairs (iterable): (key, val) tuples, as passed to update
+        '''
+
+        for key, val in pairs:
+            self.update(key, val)
+
+
+    def count_all(self, keys):
+
+        '''
+        Increment the value of every key of an iterable by one, so that the
+        table ends up holding the frequency of each key
+
+        Inputs:
+            keys (iterable): the keys to count
+        '''
+
+        for key in keys:
+            self.increment(key)
@@ -1,9 +1,19 @@
+import os
 import math
+import threading
 import Hash_Table
+import get_dates
 import create_Markov_training
 
 HASH_CELLS = 57
 
+# Process-wide cache of the source models of each order, as
+# order -> (fingerprint of scraped_csvs, [NBC, RT, SCMP, BBC models])
+source_models_cache = {}
+cache_lock = threading.Lock()
+build_lock = threading.Lock()
+rebuilding = set()
+
 # Purpose of code:
 # Use PA5's Markov model to predict which news source a user's input string
 # sounds most like. 
@@ -22,15 +32,17 @@ class Markov:
 
         self.k = k
         self.s = s
+        self.s_value = len(set(s))
         self.Hash_Table = self.get_combo_table(self.k, self.s)
+        self.context_table = self.get_context_table(self.Hash_Table)
 
 
     def get_combo_table(self,k,s):
 
         '''
-        Convert the combo_list generated from the generate_combo function
-        into a hash table with the key being each k + 1 sequence and the
-        value being the frequency of each k + 1 sequence in the combo_list
+        Count the sequences generated by the generate_combo function
+        directly into a hash table with the key being each k + 1 sequence
+        and the value being the frequency of each k + 1 sequence in s
 
         Inputs:
             k (int): a value which represents the order of the Markov model
@@ -39,56 +51,63 @@ class Markov:
         Return:
             combo_table (hash table): a hash table with the key being each
             possible k + 1 sequence and the value being the frequency of each
-            k + 1 sequence in the combo_list
+            k + 1 sequence in s
         '''
 
         combo_table = Hash_Table.Hash_Table(HASH_CELLS, 0)
-        
-        combo_list = self.generate_combo(k, s)
-        
-
-        freq_dict = {}
-        for combo in combo_list:
-            if combo in freq_dict:
-                freq_dict[combo] += 1
-            else:
-                freq_dict[combo] = 1
-
-        for name, freq in freq_dict.items():
-            combo_table.update(name, freq)
+        combo_table.count_all(self.generate_combo(k, s))
 
         return combo_table
 
 
+    def get_context_table(self, combo_table):
+
+        '''
+        Build the context-count index of a combo table: a hash table with
+        the key being every prefix (all but the last character) of a
+        sequence in the combo table, and the value being the total
+        frequency of the sequences starting with that prefix
+
+        Inputs:
+            combo_table (hash table): a table returned by get_combo_table
+
+        Return:
+            context_table (hash table): the total frequency of each prefix
+        '''
+
+        context_table = Hash_Table.Hash_Table(HASH_CELLS, 0)
+        for item in combo_table.Hash_Table:
+            if item != None:
+                context_table.increment(item[0][:-1], item[1])
+
+        return context_table
+
+
     def generate_combo(self, k, s):
 
         '''
-        Generate a list of all possible combinations of the k + 1 sequence
-        given the order of the Markov model k and the text string s
+        Generate all possible combinations of the k + 1 sequence given the
+        order of the Markov model k and the text string s, one at a time,
+        so that the sequences of a long training string are never all held
+        in memory at once
 
         Inputs:
             k (int): a value which represents the order of the Markov model
             s (str): a string of text
 
-        Returns:
-            combo_list (list): a list of all possible combinations of the 
-            k + 1 sequence
+        Yields:
+            combo (str): each k + 1 sequence, in order of position in s
         '''
 
-        combo_list = []
-
         for i in range(len(s)):
-            new_list = []
             if i + k < len(s):
-                combo_list.append(s[i:i + k + 1])
+                yield s[i:i + k + 1]
 
             else:
                 front = s[i - 1:]
                 back_index = k + i + 1 - len(s)
                 back = s[:back_index]
-                combo_list.append(front + back)
-
-        return combo_list
+                yield front + back
 
 
     def log_probability(self,s):
@@ -105,23 +124,16 @@ class Markov:
             sum_log (float): the log probability of string "s"
         '''
 
-        distinct_list = list(set(self.s))
-        s_value = len(distinct_list)
-
-        combo_list = self.generate_combo(self.k, s)
+        s_value = self.s_value
         h_table = self.Hash_Table
-        list_of_item = [item for item in h_table.Hash_Table if item != 0]
+        context_table = self.context_table
 
         sum_log = 0
 
-        for element in combo_list:
+        for element in self.generate_combo(self.k, s):
             
             m = h_table.lookup(element)
-            n = 0
-            for item in list_of_item:
-                if item != None:
-                    if item[0][:-1] == element[:-1]:
-                        n += item[1]
+            n = context_table.lookup(element[:-1])
             raw_score = (m + 1) / (n + s_value)
 
             log_score = math.log(raw_score)
@@ -130,6 +142,120 @@ class Markov:
         return sum_log
 
 
+def snapshot_fingerprint(directory=get_dates.SCRAPED_CSVS):
+
+    '''
+    Fingerprint the snapshots in scraped_csvs by the name, size and
+    modification time of every file, so that a new or changed snapshot
+    gives a new fingerprint without any CSV being read
+
+    Inputs:
+        directory (str): the folder of scraped CSVs
+
+    Return:
+        fingerprint (tuple): the sorted (name, size, mtime) of each file
+    '''
+
+    fingerprint = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            info = entry.stat()
+            fingerprint.append((entry.name, info.st_size, info.st_mtime_ns))
+
+    return tuple(sorted(fingerprint))
+
+
+def build_source_models(order):
+
+    '''
+    Train a Markov model of each news source on the training strings of
+    every snapshot
+
+    Inputs:
+        order: the order of the character-based Markov model
+
+    Return:
+        models (list): the models of NBC, RT, SCMP and BBC
+    '''
+
+    return [Markov(order, training_string) for training_string in
+            create_Markov_training.generate_training_string()]
+
+
+def rebuild_source_models(order, fingerprint):
+
+    '''
+    Retrain the source models of an order and replace them in the cache;
+    run in a background thread by source_models
+
+    Inputs:
+        order: the order of the character-based Markov model
+        fingerprint (tuple): the snapshot fingerprint being built
+    '''
+
+    try:
+        models = build_source_models(order)
+        with cache_lock:
+            source_models_cache[order] = (fingerprint, models)
+    finally:
+        with cache_lock:
+            rebuilding.discard(order)
+
+
+def source_models(order):
+
+    '''
+    Return the source models of an order from the process-wide cache. The
+    first call trains them; later calls return them at once. When the
+    snapshots in scraped_csvs have changed since the models were built,
+    they are rebuilt in a background thread while the current models keep
+    being returned.
+
+    Inputs:
+        order: the order of the character-based Markov model
+
+    Return:
+        models (list): the models of NBC, RT, SCMP and BBC
+    '''
+
+    fingerprint = snapshot_fingerprint()
+    with cache_lock:
+        cached = source_models_cache.get(order)
+        if cached is not None:
+            if cached[0] != fingerprint and order not in rebuilding:
+                rebuilding.add(order)
+                threading.Thread(target=rebuild_source_models,
+                                 args=(order, fingerprint),
+                                 daemon=True).start()
+            return cached[1]
+
+    # Only one caller trains the first models; the others wait for them
+    with build_lock:
+        with cache_lock:
+            cached = source_models_cache.get(order)
+        if cached is not None:
+            return cached[1]
+        models = build_source_models(order)
+        with cache_lock:
+            source_models_cache[order] = (fingerprint, models)
+
+    return models
+
+
+def warm_up(order=2):
+
+    '''
+    Build the source models of an order in a background thread, e.g. when
+    the app starts, so that the first guess does not wait for training
+
+    Inputs:
+        order: the order of the character-based Markov model
+    '''
+
+    threading.Thread(target=source_models, args=(order,),
+                     daemon=True).start()
+
+
 def identify_speaker(random_string, order=2):
 
     '''
@@ -151,13 +277,7 @@ def identify_speaker(random_string, order=2):
     if random_string is None:
         return ''
 
-    string_NBC, string_RT, string_SCMP, string_BBC = \
-        create_Markov_training.generate_training_string()
-
-    model1 = Markov(order, string_NBC)
-    model2 = Markov(order, string_RT)
-    model3 = Markov(order, string_SCMP)
-    model4 = Markov(order, string_BBC)
+    model1, model2, model3, model4 = source_models(order)
 
     prob1 = model1.log_probability(random_string)
     prob2 = model2.log_probability(random_string)
@@ -45,6 +45,10 @@ external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
+# Train the Markov models of the text guesser in the background, so that
+# the first guess does not wait for them
+mk.warm_up(order=2)
+
 # This app is organized into 4 tabs (dcc.Tab())
 # 1) A live scraper that scrapes data live and visualizes it in a country
 # mentions map and word cloud.
@@ -4,6 +4,8 @@ import glob
 import pandas as pd
 import datetime
 
+SCRAPED_CSVS = r"/home/student/cs122-word-freq-project/scraped_csvs"
+
 
 def RUN():
     pulling = subprocess.Popen(["git", "pull"], stdout=subprocess.PIPE)
@@ -15,11 +17,13 @@ def get_past_data(get_country_times=True):
     directly run and return a dictionary of time to dataframe
     if True, then returns country dictionary
     if False, then returns a word dictonary
+    files are read by absolute path: changing the working directory here
+    would race with the threads and modules that write relative paths
     '''
-    os.chdir(r"/home/student/cs122-word-freq-project/scraped_csvs")
-
-    countries_times = glob.glob('countries*')
-    word_times = glob.glob('words*')
+    countries_times = list(map(os.path.basename, glob.glob(
+        os.path.join(SCRAPED_CSVS, 'countries*'))))
+    word_times = list(map(os.path.basename, glob.glob(
+        os.path.join(SCRAPED_CSVS, 'words*'))))
 
     countries_times_tup = list(map(lambda x: [x, None], countries_times))
     word_times_tup = list(map(lambda x: [x, None], word_times))
@@ -28,10 +32,12 @@ def get_past_data(get_country_times=True):
     date_time_lst = []
 
     for psud_tup in countries_times_tup:
-        psud_tup[1] = pd.read_csv(psud_tup[0], header=None)
+        psud_tup[1] = pd.read_csv(os.path.join(SCRAPED_CSVS, psud_tup[0]),
+                                  header=None)
 
     for psud_tup in word_times_tup:
-        psud_tup[1] = pd.read_csv(psud_tup[0], header=None)
+        psud_tup[1] = pd.read_csv(os.path.join(SCRAPED_CSVS, psud_tup[0]),
+                                  header=None)
 
     countries_times_mod = list(
         map(lambda x: (x[0].replace('countries', '').replace(' ', '_')[:-10], x[1]), countries_times_tup))
@@ -43,8 +49,6 @@ def get_past_data(get_country_times=True):
 
     #print(countries_times_mod[4:])
 
-    os.chdir(r"/home/student/cs122-word-freq-project")
-
     countries_times_dict = dict(countries_times_mod)
     word_times_dict = dict(word_times_mod)
 
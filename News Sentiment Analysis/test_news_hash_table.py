@@ -0,0 +1,57 @@
+import os
+import random
+import importlib.util
+import pytest
+
+# Loaded by path: "Markov Model" has a Hash_Table module of its own
+spec = importlib.util.spec_from_file_location(
+    "news_hash_table",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "Hash_Table.py"))
+news_hash_table = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(news_hash_table)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_updates_match_dict(seed):
+
+    '''
+    Random updates and increments of a table starting with few cells, so
+    that it grows several times, give the same values as a dict
+    '''
+
+    rand = random.Random(seed)
+    table = news_hash_table.Hash_Table(3, 0)
+    expected = {}
+    keys = ["".join(rand.choice("abcde") for _ in range(rand.randint(1, 4)))
+            for _ in range(300)]
+
+    for _ in range(3000):
+        key = rand.choice(keys)
+        if rand.random() < 0.3:
+            val = rand.randint(0, 9)
+            table.update(key, val)
+            expected[key] = val
+        else:
+            assert table.increment(key) == expected.get(key, 0) + 1
+            expected[key] = expected.get(key, 0) + 1
+
+    assert table.cnt == len(expected)
+    assert table.cells == len(table.Hash_Table)
+    assert table.cnt < news_hash_table.TOO_FULL * table.cells
+    for key in keys:
+        assert table.lookup(key) == expected.get(key, 0)
+
+
+def test_count_all():
+
+    '''
+    count_all leaves the frequency of every key in the table
+    '''
+
+    words = "the cat and the hat and the bat".split()
+    table = news_hash_table.Hash_Table(2, 0)
+    table.count_all(words)
+
+    for word in set(words):
+        assert table.lookup(word) == words.count(word)
+    assert table.lookup("dog") == 0